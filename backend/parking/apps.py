@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ParkingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'parking'
+
+    def ready(self):
+        from django.core import checks
+
+        from .sync import check_sync_cache
+
+        checks.register(check_sync_cache, checks.Tags.caches)
+
+        # The model is loaded lazily on the first prediction; workers that serve
+        # /nearby/predict can opt into paying that cost at boot instead.
+        if getattr(settings, "PARKING_PRELOAD_MODEL", False):
+            from .prediction.registry import get_predictor
+
+            get_predictor()
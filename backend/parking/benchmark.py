@@ -0,0 +1,224 @@
+import gc
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import numpy as np
+
+from .models import Parking
+from .selectors import BAY_FIELDS, BayRow
+from .spatial import BayGrid
+from .utils import WALKING_SPEED_M_PER_S
+
+# Synthetic city: bays scattered around Melbourne's CBD, like the real bay list.
+CENTER = (-37.8136, 144.9631)
+SPREAD_DEG = 0.02
+ORIGIN = {
+    "latitude": CENTER[0],
+    "longitude": CENTER[1],
+    "address": "benchmark",
+    "formatted_address": "Synthetic origin",
+}
+WHEN = "2025-03-25T11:44:37+11:00"
+
+def rss_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+def synthetic_bays(n, seed=42):
+    """`n` unsaved Parking rows; about a third are free, as on a weekday."""
+    rnd = random.Random(seed)
+    now = datetime(2025, 3, 25, 0, 44, 37, tzinfo=timezone.utc)
+    bays = []
+    for i in range(n):
+        bays.append(Parking(
+            kerbside_id=str(10000 + i),
+            zone_number=str(7000 + i % 300),
+            status_description="Unoccupied" if rnd.random() < 0.35 else "Present",
+            status_timestamp=now - timedelta(minutes=rnd.randrange(240)),
+            latitude=CENTER[0] + rnd.uniform(-SPREAD_DEG, SPREAD_DEG),
+            longitude=CENTER[1] + rnd.uniform(-SPREAD_DEG, SPREAD_DEG),
+            last_updated=now,
+            sign_text=rnd.choice(["2P MTR M-SAT 7:30-18:30", "1P", "LZ 30M", None]),
+            days_of_week=rnd.choice(["Mon-Fri", "Mon-Sun", None]),
+        ))
+    return bays
+
+def synthetic_predictor(bays, rows=20000, seed=42):
+    """A ParkingPredictor fitted on random history with a day/night pattern."""
+    import pandas as pd
+
+    from .prediction.features import INPUT_COLUMNS, build_pipeline
+    from .prediction.main import ParkingPredictor
+    from sklearn.linear_model import SGDClassifier
+
+    rng = np.random.default_rng(seed)
+    pick = rng.integers(0, len(bays), rows)
+    hour = rng.integers(0, 24, rows)
+    data = pd.DataFrame({
+        "zone_number": [int(bays[i].zone_number) for i in pick],
+        "kerbsideid": [int(bays[i].kerbside_id) for i in pick],
+        "hour": hour,
+        "dow": rng.integers(0, 7, rows),
+    })
+    p_free = np.where((hour < 7) | (hour > 19), 0.8, 0.3)
+    predictor = ParkingPredictor()
+    predictor.model = build_pipeline(SGDClassifier(loss="log_loss", random_state=seed))
+    predictor.model.fit(data[INPUT_COLUMNS], (rng.random(rows) < p_free).astype(int))
+    return predictor
+
+def _summary(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min()),
+    }
+
+def _time(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def bench_single(predictor, bays, calls):
+    sample = bays[:calls]
+    started = time.perf_counter()
+    for bay in sample:
+        predictor.predict_proba(int(bay.zone_number), int(bay.kerbside_id), WHEN)
+    elapsed = time.perf_counter() - started
+    return {"calls": len(sample), "us_per_row": elapsed / len(sample) * 1e6, "rows_per_s": len(sample) / elapsed}
+
+def bench_batch(predictor, bays, sizes, repeat):
+    out = {}
+    for size in sizes:
+        chunk = bays[:size]
+        zones = [int(b.zone_number) for b in chunk]
+        ids = [int(b.kerbside_id) for b in chunk]
+        stats = _summary(_time(lambda: predictor.predict_proba_many(zones, ids, WHEN), repeat))
+        stats["us_per_row"] = stats["p50_ms"] * 1000 / len(chunk)
+        stats["rows_per_s"] = len(chunk) / (stats["p50_ms"] / 1000)
+        out[str(len(chunk))] = stats
+    return out
+
+def bench_views(predictor, bays, walk_times, repeat):
+    """
+    End-to-end latency of the nearby views (request parsing, grid search, predictions,
+    serialization and JSON rendering) with the geocoder and bay index stubbed.
+    """
+    from rest_framework.test import APIRequestFactory
+
+    from .prediction.scores import ScoreTable, write_scores
+    from .views import ParkingNearbyApi, ParkingNearbyPredictApi
+
+    grid = BayGrid([BayRow._make(getattr(b, f) for f in BAY_FIELDS) for b in bays if not b.is_occupied])
+    factory = APIRequestFactory()
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scores.npz")
+        ids = np.array([int(b.kerbside_id) for b in bays])
+        zones = np.array([int(b.zone_number) for b in bays])
+        write_scores(path, ids, zones, predictor.score_hours(zones, ids), model_digest=None)
+        tables = {"live": ScoreTable(None), "table": ScoreTable(path, check_interval=3600)}
+
+        cases = [("nearby", ParkingNearbyApi, "/parking/nearby", None)]
+        cases += [(f"predict_{mode}", ParkingNearbyPredictApi, "/parking/nearby/predict", mode) for mode in tables]
+        for name, view_class, url, mode in cases:
+            view = view_class.as_view()
+            for walk in walk_times:
+                body = {"address": "benchmark", "max_walk_time": walk}
+                if mode:
+                    body["datetime"] = WHEN
+                sizes = []
+
+                def call():
+                    response = view(factory.post(url, body, format="json"))
+                    response.render()
+                    assert response.status_code == 200, response.data
+                    sizes.append(len(response.content))
+
+                with ExitStack() as stack:
+                    stack.enter_context(mock.patch("parking.views.geocode_address", return_value=ORIGIN))
+                    stack.enter_context(mock.patch("parking.views.free_bay_index", return_value=grid))
+                    stack.enter_context(mock.patch("parking.views.get_predictor", return_value=predictor))
+                    stack.enter_context(mock.patch("parking.views.get_score_table", return_value=tables[mode or "live"]))
+                    stats = _summary(_time(call, repeat))
+                stats["spots"] = len(grid.within(ORIGIN["latitude"], ORIGIN["longitude"], walk * 60 * WALKING_SPEED_M_PER_S)[0])
+                stats["bytes"] = sizes[-1]
+                out[f"{name}_walk{walk}"] = stats
+    return out
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(bays=5000, single_calls=200, batch_sizes=(1, 10, 100, 1000, 5000), walk_times=(5, 15),
+        repeat=20, seed=42):
+    """Every benchmark with the given parameters; returns a JSON-serialisable dict."""
+    import pandas as pd
+    import sklearn
+
+    memory = {"start_mb": rss_mb()}
+    started = time.perf_counter()
+    synthetic = synthetic_bays(bays, seed)
+    predictor = synthetic_predictor(synthetic, seed=seed)
+    gc.collect()
+    memory["model_loaded_mb"] = rss_mb()
+
+    results = {
+        "predict_single": bench_single(predictor, synthetic, single_calls),
+        "predict_batch": bench_batch(predictor, synthetic, batch_sizes, repeat),
+        "views": bench_views(predictor, synthetic, walk_times, repeat),
+    }
+    memory["end_mb"] = rss_mb()
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "params": {"bays": bays, "single_calls": single_calls, "batch_sizes": list(batch_sizes),
+                       "walk_times": list(walk_times), "repeat": repeat, "seed": seed},
+            "seconds": time.perf_counter() - started,
+        },
+        "memory": memory,
+        "results": results,
+    }
+
+def flatten(results, prefix=""):
+    """{'a': {'b': 1}} -> {'a.b': 1}, for comparing two runs metric by metric."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from .history_sql import _iso, _run, _scoped_bays, _t
+from . import rollups
+
+HEATMAP_TABLE = "agg_heatmap"
+HEATMAP_META_TABLE = "agg_heatmap_meta"
+
+def create_tables_sql() -> list:
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {_t(HEATMAP_TABLE)} (
+            scope       VARCHAR(16) NOT NULL,
+            scope_id    VARCHAR(64) NOT NULL,
+            window_days SMALLINT    NOT NULL,
+            dow         TINYINT     NOT NULL,
+            hh          TINYINT     NOT NULL,
+            samples     BIGINT      NOT NULL DEFAULT 0,
+            free_sum    BIGINT      NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, scope_id, window_days, dow, hh)
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {_t(HEATMAP_META_TABLE)} (
+            scope        VARCHAR(16) NOT NULL,
+            scope_id     VARCHAR(64) NOT NULL,
+            window_days  SMALLINT    NOT NULL,
+            start_ts     DATETIME    NULL,
+            end_ts       DATETIME    NULL,
+            refreshed_at DATETIME    NULL,
+            PRIMARY KEY (scope, scope_id, window_days)
+        )
+        """,
+    ]
+
+def ensure_tables() -> None:
+    for sql in create_tables_sql():
+        _run(sql, [])
+
+def canonical_scope(scope: str) -> str:
+    s = (scope or "").lower()
+    return "segment" if s == "street_segment" else s
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def _bucket_sql_for_scope(sb_sql: str) -> str:
+    # Per (dow, hour) sums over whole rollup hours in [start, end).
+    return f"""
+    WITH scoped_bays AS {sb_sql}
+    SELECT MOD((DAYOFWEEK(h.hour_ts)+5), 7) AS dow,  -- 0=Mon..6=Sun
+           HOUR(h.hour_ts)                   AS hh,
+           SUM(h.samples)                    AS samples,
+           SUM(h.free_obs)                   AS free_sum
+    FROM {_t(rollups.HOURLY_TABLE)} h
+    JOIN scoped_bays sb ON sb.bay_id = h.bay_id
+    WHERE h.hour_ts >= %s AND h.hour_ts < %s
+    GROUP BY dow, hh
+    """
+
+def _buckets(sb_sql: str, scope_id: str, start: datetime, end: datetime) -> List[Tuple[int, int, int, int]]:
+    if start >= end:
+        return []
+    return _run(_bucket_sql_for_scope(sb_sql), [scope_id, _iso(start), _iso(end)])
+
+def _read_matrix(scope: str, scope_id: str, window_days: int) -> Dict[Tuple[int, int], List[int]]:
+    rows = _run(
+        f"""SELECT dow, hh, samples, free_sum FROM {_t(HEATMAP_TABLE)}
+            WHERE scope = %s AND scope_id = %s AND window_days = %s""",
+        [scope, scope_id, window_days],
+    )
+    return {(int(d), int(h)): [int(s), int(f)] for d, h, s, f in rows}
+
+def register(scope: str, scope_id: str, window_days: int) -> None:
+    """Ask the background refresher to materialise this key (no-op if already tracked)."""
+    _run(
+        f"""INSERT IGNORE INTO {_t(HEATMAP_META_TABLE)} (scope, scope_id, window_days)
+            VALUES (%s, %s, %s)""",
+        [canonical_scope(scope), scope_id, window_days],
+    )
+
+def refresh(scope: str, scope_id: str, window_days: int, now: Optional[datetime] = None) -> bool:
+    """
+    Slide one stored heatmap to the trailing `window_days` ending at the last fully
+    folded rollup hour. Only the hours that entered the window are added and the hours
+    that left it subtracted, so counts stay exact without rescanning the whole window.
+    Returns False when the rollup has nothing folded yet or the scope is unknown.
+    """
+    sb_sql = _scoped_bays(scope)
+    if not sb_sql:
+        return False
+    watermark = rollups.get_watermark()
+    if watermark is None:
+        return False
+    end = _floor_hour(min(now or datetime.utcnow(), watermark))
+    start = end - timedelta(days=window_days)
+    scope = canonical_scope(scope)
+
+    with transaction.atomic():
+        meta = _run(
+            f"""SELECT start_ts, end_ts FROM {_t(HEATMAP_META_TABLE)}
+                WHERE scope = %s AND scope_id = %s AND window_days = %s FOR UPDATE""",
+            [scope, scope_id, window_days],
+        )
+        old_start, old_end = meta[0] if meta else (None, None)
+
+        if old_start is None or old_end is None or old_end <= start or old_end > end:
+            # First build, or the old window no longer overlaps: recompute from scratch.
+            matrix: Dict[Tuple[int, int], List[int]] = {}
+            added, removed = _buckets(sb_sql, scope_id, start, end), []
+        else:
+            matrix = _read_matrix(scope, scope_id, window_days)
+            added = _buckets(sb_sql, scope_id, old_end, end)
+            removed = _buckets(sb_sql, scope_id, old_start, start)
+
+        for sign, rows in ((1, added), (-1, removed)):
+            for dow, hh, samples, free_sum in rows:
+                cell = matrix.setdefault((int(dow), int(hh)), [0, 0])
+                cell[0] += sign * int(samples or 0)
+                cell[1] += sign * int(free_sum or 0)
+
+        _run(
+            f"DELETE FROM {_t(HEATMAP_TABLE)} WHERE scope = %s AND scope_id = %s AND window_days = %s",
+            [scope, scope_id, window_days],
+        )
+        values = [(scope, scope_id, window_days, d, h, s, f) for (d, h), (s, f) in sorted(matrix.items()) if s > 0]
+        if values:
+            with connection.cursor() as cur:
+                cur.executemany(
+                    f"""INSERT INTO {_t(HEATMAP_TABLE)}
+                        (scope, scope_id, window_days, dow, hh, samples, free_sum)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                    values,
+                )
+        _run(
+            f"""INSERT INTO {_t(HEATMAP_META_TABLE)}
+                    (scope, scope_id, window_days, start_ts, end_ts, refreshed_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE start_ts = VALUES(start_ts), end_ts = VALUES(end_ts),
+                                        refreshed_at = VALUES(refreshed_at)""",
+            [scope, scope_id, window_days, _iso(start), _iso(end), _iso(datetime.utcnow())],
+        )
+    return True
+
+def invalidate(since: datetime, until: datetime) -> int:
+    """
+    Forget the window of every stored heatmap overlapping [since, until), whose rollup
+    hours were rewritten (rollups.rebuild_hourly). Sliding them would subtract counts that
+    no longer match what was added, so their next refresh recomputes them from scratch;
+    until then `load` treats them as misses. Returns the number of keys reset.
+    """
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""UPDATE {_t(HEATMAP_META_TABLE)} SET start_ts = NULL, end_ts = NULL
+                WHERE start_ts < %s AND end_ts > %s""",
+            [_iso(until), _iso(since)],
+        )
+        return cur.rowcount
+
+def tracked_keys() -> List[Tuple[str, str, int]]:
+    return _run(f"SELECT scope, scope_id, window_days FROM {_t(HEATMAP_META_TABLE)}", [])
+
+def load(scope: str, scope_id: str, window_days: int, max_age: timedelta) -> Optional[List[Dict]]:
+    """
+    Stored heatmap in the endpoint's shape, or None when the key isn't materialised
+    or its window ends more than `max_age` ago.
+    """
+    scope = canonical_scope(scope)
+    try:
+        meta = _run(
+            f"""SELECT end_ts FROM {_t(HEATMAP_META_TABLE)}
+                WHERE scope = %s AND scope_id = %s AND window_days = %s""",
+            [scope, scope_id, window_days],
+        )
+    except Exception:
+        # Store not created yet: behave like a miss.
+        return None
+    if not meta or meta[0][0] is None or meta[0][0] < datetime.utcnow() - max_age:
+        return None
+    matrix = _read_matrix(scope, scope_id, window_days)
+    return [
+        {"dow": d, "hh": h, "samples": s, "avg_free_ratio": f / s}
+        for (d, h), (s, f) in sorted(matrix.items()) if s > 0
+    ]
@@ -0,0 +1,85 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from . import rollups
+from .heatmaps import canonical_scope
+from .history_sql import _iso
+
+KEY_PREFIX = "history:v1:"
+
+def open_window_end(now: datetime = None) -> str:
+    """
+    End of an open-ended window: `now` rounded up to the next whole hour, so every
+    request within the same hour shares one normalised window (and one cache key).
+    """
+    now = now or datetime.utcnow()
+    floor = now.replace(minute=0, second=0, microsecond=0)
+    return _iso(floor if floor == now else floor + timedelta(hours=1))
+
+def _rollup_version() -> Optional[str]:
+    try:
+        watermark = rollups.get_watermark()
+    except Exception:
+        # No rollup table: answers come from raw rows only.
+        return None
+    return None if watermark is None else _iso(watermark)
+
+def cache_key(kind: str, data: Dict[str, Any], start_iso: str, end_iso: str, **extra: Any) -> str:
+    """
+    Key of one normalised query. It includes the rollup watermark, so each fold (which
+    moves hours from raw rows into the rollup and the heatmap store) starts fresh keys.
+    """
+    has_scope = bool(data.get("scope") and data.get("id"))
+    query = {
+        "kind": kind,
+        "scope": canonical_scope(data["scope"]) if has_scope else None,
+        "id": str(data["id"]) if has_scope else None,
+        # ~1 m resolution is plenty to share point searches from the same spot.
+        "lat": None if has_scope or data.get("lat") is None else round(float(data["lat"]), 5),
+        "lng": None if has_scope or data.get("lng") is None else round(float(data["lng"]), 5),
+        "radius": None if has_scope else data.get("radiusMeters"),
+        "start": start_iso,
+        "end": end_iso,
+        "rollup": _rollup_version(),
+        **extra,
+    }
+    raw = json.dumps(query, sort_keys=True, default=str)
+    return KEY_PREFIX + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def ttl_for(end_iso: str, now: datetime = None) -> int:
+    """
+    Windows ending in the last hour (or in the future) still gain rows, so they live
+    briefly; windows that ended days ago are settled history and can be kept long.
+    """
+    now = now or datetime.utcnow()
+    end = datetime.fromisoformat(end_iso)
+    if end >= now - timedelta(hours=1):
+        return getattr(settings, "HISTORY_CACHE_TTL_RECENT", 60)
+    if end >= now - timedelta(days=1):
+        return getattr(settings, "HISTORY_CACHE_TTL_DAY", 900)
+    return getattr(settings, "HISTORY_CACHE_TTL_SETTLED", 86400)
+
+def respond(key: str, end_iso: str, compute: Callable[[], Response]) -> Response:
+    """
+    Serve `key` from the cache or build it with `compute()`; only 200 answers are stored.
+    The body's "cache" field and the X-Cache header say whether it was a hit.
+    """
+    cache = caches[getattr(settings, "HISTORY_CACHE_ALIAS", "default")]
+    payload = cache.get(key)
+    if payload is not None:
+        response = Response({**payload, "cache": "hit"})
+        response["X-Cache"] = "hit"
+        return response
+
+    response = compute()
+    if response.status_code == 200:
+        cache.set(key, dict(response.data), ttl_for(end_iso))
+        response.data = {**response.data, "cache": "miss"}
+        response["X-Cache"] = "miss"
+    return response
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from django.db import connection
+
+# Your DB schema prefix
+SCHEMA = "parking_prod"
+
+# 1 when a raw ops_bay_status row means the bay was occupied, else 0.
+OCC_CASE = """
+    CASE
+      WHEN UPPER(COALESCE(o.status_desc,'')) IN ('OCCUPIED','BUSY') THEN 1
+      WHEN o.status_desc IN (1,'1','Y','YES','Y') THEN 1
+      ELSE 0
+    END
+"""
+
+def _t(name: str) -> str:
+    return f"{SCHEMA}.{name}" if SCHEMA else name
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+def _run(sql: str, params: List[Any]) -> List[Tuple]:
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+# -------------------- BAY SCOPE HELPERS --------------------
+
+def _scoped_bays(scope: str) -> Optional[str]:
+    """
+    Build a SQL subselect that yields a single-column table (bay_id) for the requested scope.
+    Supported given your actual columns:
+      - "segment" or "street_segment"  -> asset_parking_bay.segment_id = %s
+      - "bay"                           -> a single bay_id = %s
+    """
+    s = (scope or "").lower()
+    if s in ("segment", "street_segment"):
+        return f"(SELECT b.bay_id FROM {_t('asset_parking_bay')} b WHERE b.segment_id = %s)"
+    if s == "bay":
+        # Pass the bay_id directly as a single-row "table"
+        return "(SELECT %s AS bay_id)"
+    return None
+
+def _bay_list_subselect(count: int) -> str:
+    """
+    Same single-column (bay_id) table as `_scoped_bays`, for an explicit list of
+    `count` bay ids passed as params. An empty list yields a table that matches nothing.
+    """
+    if count <= 0:
+        return "(SELECT NULL AS bay_id)"
+    return "(" + " UNION ALL ".join(["SELECT %s AS bay_id"] * count) + ")"
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Parking
+from .utils import fresh_db_connection
+
+logger = logging.getLogger(__name__)
+
+LIVE_FIELDS = ("kerbside_id", "zone_number", "status_description", "latitude", "longitude", "last_updated")
+
+class Subscriber:
+    """One open stream: its own bounded queue plus an optional zone / bounding-box filter."""
+
+    def __init__(self, zones=None, bbox=None, max_queue=1000):
+        self.zones = set(zones) if zones else None
+        self.bbox = bbox  # (min_lat, min_lng, max_lat, max_lng)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def wants(self, event):
+        if self.zones is not None and event.get("zone_number") not in self.zones:
+            return False
+        if self.bbox is not None:
+            lat, lng = event.get("latitude"), event.get("longitude")
+            if lat is None or lng is None:
+                return False
+            min_lat, min_lng, max_lat, max_lng = self.bbox
+            if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+                return False
+        return True
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: tell it to resync instead of buffering forever.
+            self.overflowed = True
+
+class InMemoryBroker:
+    """Fans events out to the subscribers of this process."""
+
+    def __init__(self):
+        self.subscribers = set()
+
+    def subscribe(self, subscriber):
+        self.subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, events):
+        for subscriber in list(self.subscribers):
+            for event in events:
+                if subscriber.wants(event):
+                    subscriber.offer(event)
+
+@fresh_db_connection
+def _snapshot():
+    return {
+        row[0]: dict(zip(LIVE_FIELDS, row))
+        for row in Parking.objects.values_list(*LIVE_FIELDS)
+    }
+
+def diff_snapshots(previous, current):
+    """Change events between two {kerbside_id: row} snapshots."""
+    events = []
+    for kerbside_id, row in current.items():
+        old = previous.get(kerbside_id)
+        if old is None or old["status_description"] != row["status_description"]:
+            events.append({
+                "type": "status",
+                **row,
+                "is_occupied": row["status_description"] == "Present",
+                "last_updated": row["last_updated"].isoformat() if row["last_updated"] else None,
+            })
+    for kerbside_id in previous.keys() - current.keys():
+        old = previous[kerbside_id]
+        events.append({
+            "type": "removed",
+            "kerbside_id": kerbside_id,
+            "zone_number": old["zone_number"],
+            "latitude": old["latitude"],
+            "longitude": old["longitude"],
+        })
+    return events
+
+class ChangeDetector:
+    """
+    Polls the bay view once every PARKING_LIVE_POLL_SECONDS for the whole process and
+    publishes the differences, so N open streams cost one query per interval.
+    Runs only while somebody is subscribed.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._task = None
+        self._snapshot = None
+        self.last_poll = None
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def poll_once(self):
+        current = await sync_to_async(_snapshot, thread_sensitive=False)()
+        if self._snapshot is not None:
+            events = diff_snapshots(self._snapshot, current)
+            if events:
+                self.broker.publish(events)
+        self._snapshot = current
+        self.last_poll = time.time()
+
+    async def _run(self):
+        interval = getattr(settings, "PARKING_LIVE_POLL_SECONDS", 5)
+        while self.broker.subscribers:
+            try:
+                await self.poll_once()
+            except Exception:
+                # Keep streams open through transient DB errors; the next poll retries.
+                logger.exception("Live bay poll failed")
+            await asyncio.sleep(interval)
+        # Nobody listening: drop state so the next subscriber starts from a fresh baseline.
+        self._snapshot = None
+
+broker = InMemoryBroker()
+detector = ChangeDetector(broker)
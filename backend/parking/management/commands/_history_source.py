@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import CommandError
+
+# Shared --file / --from-db options of the model training commands.
+
+def add_source_arguments(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="Training export: .jsonl, .csv or a data.json-style .json array.")
+    source.add_argument("--from-db", action="store_true", help="Stream rows from ops_bay_status.")
+    parser.add_argument("--since", help="ISO start for --from-db (default: 28 days before --until).")
+    parser.add_argument("--until", help="ISO end for --from-db (default: now).")
+    parser.add_argument("--window-hours", type=int, default=24, help="ops_bay_status rows fetched per query.")
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+
+def _parse(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"--{name} must be an ISO datetime, got {value!r}")
+
+def chunk_source(options):
+    """Zero-argument callable returning a fresh iterator of raw history chunks."""
+    from parking.prediction.training import iter_file, iter_ops_bay_status
+
+    chunk_rows = max(options["chunk_rows"], 1)
+    if options["file"]:
+        return lambda: iter_file(options["file"], chunk_rows)
+    until = _parse(options["until"], "until") if options["until"] else datetime.utcnow()
+    since = _parse(options["since"], "since") if options["since"] else until - timedelta(days=28)
+    window = timedelta(hours=max(options["window_hours"], 1))
+    return lambda: iter_ops_bay_status(since, until, chunk_rows, window)
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Lower is better for these; everything else (throughput) is higher-is-better.
+_LOWER_IS_BETTER = ("_ms", "us_per_row", "_mb", "bytes")
+
+def _ints(value):
+    try:
+        return tuple(int(v) for v in value.split(",") if v)
+    except ValueError:
+        raise CommandError(f"Expected a comma-separated list of integers, got {value!r}")
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the prediction path on synthetic bays and a synthetic model: single vs "
+        "batched predictions, nearby / predict view latency (geocoder stubbed) and RSS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bays", type=int, default=5000)
+        parser.add_argument("--single-calls", type=int, default=200)
+        parser.add_argument("--batch-sizes", default="1,10,100,1000,5000")
+        parser.add_argument("--walk-times", default="5,15", help="max_walk_time values for the view runs.")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--compare", help="Earlier --output file to diff this run against.")
+
+    def handle(self, *args, **options):
+        from parking.benchmark import flatten, run
+
+        report = run(
+            bays=options["bays"],
+            single_calls=max(options["single_calls"], 1),
+            batch_sizes=_ints(options["batch_sizes"]),
+            walk_times=_ints(options["walk_times"]),
+            repeat=max(options["repeat"], 1),
+            seed=options["seed"],
+        )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        metrics = flatten({"memory": report["memory"], **report["results"]})
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                previous = json.load(f)
+            baseline = flatten({"memory": previous["memory"], **previous["results"]})
+            self.stdout.write(f"Comparing against {previous['meta'].get('revision')} ({previous['meta'].get('timestamp')})")
+
+        for name, value in metrics.items():
+            if name.endswith(("mean_ms", "min_ms", "calls")):
+                continue
+            line = f"{name:<48}{value:>14.3f}"
+            if name in baseline and baseline[name]:
+                change = (value - baseline[name]) / baseline[name] * 100
+                worse = change > 0 if name.endswith(_LOWER_IS_BETTER) else change < 0
+                line += f"{baseline[name]:>14.3f}{change:>+9.1f}%"
+                if abs(change) >= 10:
+                    line += "  " + (self.style.ERROR("worse") if worse else self.style.SUCCESS("better"))
+            self.stdout.write(line)
+        self.stdout.write(f"Done in {report['meta']['seconds']:.1f}s (revision {report['meta']['revision']}).")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from parking import heatmaps
+from parking.views_history import SUMMARY_WINDOW_DAYS
+
+class Command(BaseCommand):
+    help = "Slide every tracked 7×24 heatmap forward using the hourly rollup (run after refresh_hourly_rollup)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--create", action="store_true", help="Create the heatmap store tables if missing.")
+        parser.add_argument("--scope", help="Track (and refresh) this scope, e.g. segment or bay.")
+        parser.add_argument("--id", help="segment_id or bay_id for --scope.")
+        parser.add_argument("--window-days", type=int, default=SUMMARY_WINDOW_DAYS)
+
+    def handle(self, *args, **options):
+        if options["create"]:
+            heatmaps.ensure_tables()
+        if options["scope"] and options["id"]:
+            heatmaps.register(options["scope"], options["id"], options["window_days"])
+
+        refreshed = skipped = 0
+        for scope, scope_id, window_days in heatmaps.tracked_keys():
+            if heatmaps.refresh(scope, scope_id, int(window_days)):
+                refreshed += 1
+            else:
+                skipped += 1
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} heatmaps ({skipped} skipped)."))
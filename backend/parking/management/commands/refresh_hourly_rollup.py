@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from parking import rollups
+
+class Command(BaseCommand):
+    help = "Incrementally fold new ops_bay_status rows into the per-bay hourly rollup (agg_bay_hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--create", action="store_true", help="Create the rollup tables if missing.")
+        parser.add_argument("--since", help="ISO start for the very first run (default: oldest raw row).")
+        parser.add_argument("--lag-minutes", type=int, default=2,
+                            help="Leave the newest N minutes for the next run so late inserts are not skipped.")
+        parser.add_argument("--batch-hours", type=int, default=24)
+        parser.add_argument("--rebuild-from", help="ISO start of whole hours to recompute from raw rows.")
+        parser.add_argument("--rebuild-to", help="ISO end (exclusive) for --rebuild-from; default: watermark.")
+
+    def _parse(self, value, name):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"--{name} must be an ISO datetime, got {value!r}")
+
+    def handle(self, *args, **options):
+        if options["create"]:
+            rollups.ensure_tables()
+
+        if options["rebuild_from"]:
+            since = self._parse(options["rebuild_from"], "rebuild-from")
+            until = self._parse(options["rebuild_to"], "rebuild-to") if options["rebuild_to"] else datetime.max
+            rollups.rebuild_hourly(since, until)
+            self.stdout.write(f"Rebuilt hourly rollup from {since:%Y-%m-%d %H:00}.")
+
+        since = self._parse(options["since"], "since") if options["since"] else None
+        until = datetime.utcnow() - timedelta(minutes=options["lag_minutes"])
+        result = rollups.fold_hourly(until=until, since=since, batch=timedelta(hours=options["batch_hours"]))
+        if not result["windows"]:
+            self.stdout.write("Hourly rollup already up to date.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {result['from']} → {result['to']} into the hourly rollup ({result['windows']} windows)."
+        ))
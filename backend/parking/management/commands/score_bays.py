@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from parking.models import Parking
+from parking.prediction.registry import get_registry
+from parking.prediction.scores import DEFAULT_SCORES_PATH, write_scores
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+class Command(BaseCommand):
+    help = (
+        "Score every bay for all 24 hours (× day of week when the model uses it) and "
+        "write the table the predict endpoints look probabilities up in."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Score file (default: PARKING_SCORES_PATH).")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Bays per model call.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        path = options["output"] or getattr(settings, "PARKING_SCORES_PATH", DEFAULT_SCORES_PATH)
+        registry = get_registry()
+        predictor = registry.get()
+
+        bays = {}
+        for kerbside_id, zone_number in Parking.objects.values_list("kerbside_id", "zone_number"):
+            bay, zone = _int(kerbside_id), _int(zone_number)
+            if bay is not None and zone is not None:
+                bays[bay] = zone
+        bay_ids = np.fromiter(bays.keys(), dtype=np.int64, count=len(bays))
+        zone_numbers = np.fromiter(bays.values(), dtype=np.int64, count=len(bays))
+
+        batch = max(options["batch_size"], 1)
+        days = 7 if predictor.uses_dow else 1
+        probs = np.empty((len(bay_ids), days, 24), dtype=np.float32)
+        for start in range(0, len(bay_ids), batch):
+            stop = start + batch
+            probs[start:stop] = predictor.score_hours(zone_numbers[start:stop], bay_ids[start:stop])
+
+        write_scores(path, bay_ids, zone_numbers, probs, registry.digest)
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {len(bay_ids)} bays × {days * 24} slots in {time.perf_counter() - started:.1f}s → {path}"
+        ))
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Modules that dominate cold start when something imports them eagerly.
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "sklearn", "joblib", "httpx")
+
+# Runs in a fresh interpreter: set Django up, then time importing one module.
+PROBE = """
+import importlib, json, sys, time
+import os
+def rss_kb():
+    # Current RSS on Linux; peak RSS elsewhere (None where neither is available).
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return None
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+rss0 = rss_kb()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+t2 = time.perf_counter()
+rss1 = rss_kb()
+print(json.dumps({
+    "setup_ms": (t1 - t0) * 1000,
+    "import_ms": (t2 - t1) * 1000,
+    "rss_kb": rss1,
+    "rss_delta_kb": None if rss0 is None else rss1 - rss0,
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+def _existing(modules):
+    from importlib.util import find_spec
+
+    found = []
+    for name in modules:
+        try:
+            if find_spec(name) is not None:
+                found.append(name)
+        except ImportError:
+            pass
+    return found
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold import time and RSS per local app (each in a fresh interpreter) "
+        "to spot modules that load heavy dependencies at startup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per target; the fastest is reported.")
+        parser.add_argument("--module", action="append", default=[], help="Extra module to measure (repeatable).")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def _probe(self, modules, repeat):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings"))
+        best = None
+        for _ in range(max(repeat, 1)):
+            out = subprocess.run(
+                [sys.executable, "-c", PROBE, *modules],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            if best is None or result["import_ms"] < best["import_ms"]:
+                best = result
+        return best
+
+    def handle(self, *args, **options):
+        base_dir = str(settings.BASE_DIR)
+        targets = [("django.setup()", [])]
+        for config in apps.get_app_configs():
+            if not config.path.startswith(base_dir):
+                continue
+            modules = _existing(f"{config.name}.{m}" for m in ("admin", "views", "urls"))
+            if modules:
+                targets.append((config.label, modules))
+        targets.append(("ROOT_URLCONF", [settings.ROOT_URLCONF]))
+        targets += [(name, [name]) for name in options["module"]]
+
+        report = []
+        for label, modules in targets:
+            result = self._probe(modules, options["repeat"])
+            report.append({"target": label, "modules": modules, **result})
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{'target':<28}{'setup ms':>10}{'import ms':>11}{'rss MB':>9}{'+rss MB':>9}  heavy deps")
+        for row in report:
+            rss = "-" if row["rss_kb"] is None else f"{row['rss_kb'] / 1024:.1f}"
+            delta = "-" if row["rss_delta_kb"] is None else f"{row['rss_delta_kb'] / 1024:.1f}"
+            self.stdout.write(
+                f"{row['target']:<28}{row['setup_ms']:>10.0f}{row['import_ms']:>11.0f}"
+                f"{rss:>9}{delta:>9}  {', '.join(row['heavy']) or '-'}"
+            )
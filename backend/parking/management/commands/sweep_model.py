@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.prediction.registry import DEFAULT_MODEL_PATH
+
+from ._history_source import add_source_arguments, chunk_source
+
+class Command(BaseCommand):
+    help = (
+        "Cross-validate a grid of estimators / hyper-parameters in parallel, report "
+        "log-loss, AUC, fit time and latency per 1k bays, and promote the best model."
+    )
+
+    def add_arguments(self, parser):
+        add_source_arguments(parser)
+        parser.add_argument("--max-rows", type=int, default=500_000, help="Newest rows of history to sweep on.")
+        parser.add_argument("--folds", type=int, default=3)
+        parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel fits (-1: one per core).")
+        parser.add_argument("--estimator", action="append", help="Only sweep these estimators (repeatable).")
+        parser.add_argument("--max-latency-ms", type=float,
+                            help="Only promote candidates scoring 1k bays within this many ms.")
+        parser.add_argument("--report", help="Also write the per-candidate results as JSON to this file.")
+        parser.add_argument("--output", help="Model file to promote to (default: PARKING_MODEL_PATH).")
+        parser.add_argument("--dry-run", action="store_true", help="Report only; don't promote.")
+
+    def handle(self, *args, **options):
+        from parking.prediction.sweep import CANDIDATES, candidates, load_recent, make_model, pick_best, run_sweep
+        from parking.prediction.training import save_model
+
+        unknown = set(options["estimator"] or ()) - set(CANDIDATES)
+        if unknown:
+            raise CommandError(f"Unknown estimator(s) {sorted(unknown)}; choose from {sorted(CANDIDATES)}")
+
+        started = time.perf_counter()
+        try:
+            data = load_recent(chunk_source(options)(), max(options["max_rows"], 1))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        grid = candidates(options["estimator"])
+        results, sweep_seconds = run_sweep(data, grid, folds=max(options["folds"], 2), n_jobs=options["n_jobs"])
+        best = pick_best(results, options["max_latency_ms"])
+
+        self.stdout.write(f"{len(data)} rows, {len(grid)} candidates × {options['folds']} folds in {sweep_seconds:.1f}s")
+        self.stdout.write(f"{'estimator':<10}{'params':<18}{'bits':>5}{'log-loss':>10}{'AUC':>8}{'fit s':>8}{'ms/1k':>8}")
+        for r in sorted(results, key=lambda r: r["log_loss"]):
+            params = ",".join(f"{k}={v:g}" for k, v in r["params"].items())
+            mark = "  *" if r is best else ""
+            self.stdout.write(
+                f"{r['estimator']:<10}{params:<18}{r['hash_bits']:>5}{r['log_loss']:>10.4f}{r['auc']:>8.4f}"
+                f"{r['fit_seconds']:>8.2f}{r['latency_ms_per_1k']:>8.2f}{mark}"
+            )
+
+        if options["report"]:
+            with open(options["report"], "w") as f:
+                json.dump({"rows": len(data), "sweep_seconds": sweep_seconds, "best": best, "results": results}, f, indent=2)
+        if options["dry_run"]:
+            return
+
+        from parking.prediction.features import INPUT_COLUMNS
+
+        model = make_model(best["estimator"], best["params"], best["hash_bits"])
+        model.fit(data[INPUT_COLUMNS], data["available"].to_numpy())
+        path = options["output"] or getattr(settings, "PARKING_MODEL_PATH", DEFAULT_MODEL_PATH)
+        save_model(model, path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Promoted {best['estimator']} {best['params']} ({best['hash_bits']} bits) → {path} "
+            f"in {time.perf_counter() - started:.1f}s total. Run score_bays to refresh precomputed scores."
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.prediction.registry import DEFAULT_MODEL_PATH
+
+from ._history_source import add_source_arguments, chunk_source
+
+class Command(BaseCommand):
+    help = (
+        "Train the parking model incrementally over chunks of history (a .jsonl/.csv "
+        "export or ops_bay_status), so memory stays bounded by --chunk-rows."
+    )
+
+    def add_arguments(self, parser):
+        add_source_arguments(parser)
+        parser.add_argument("--epochs", type=int, default=1)
+        parser.add_argument("--alpha", type=float, default=1e-4, help="SGD regularisation strength.")
+        parser.add_argument("--hash-bits", type=int, default=18, help="Hashed zone/bay feature space is 2**bits wide.")
+        parser.add_argument("--output", help="Model file (default: PARKING_MODEL_PATH).")
+
+    def handle(self, *args, **options):
+        from parking.prediction.training import save_model, train_streaming
+
+        chunks = chunk_source(options)
+
+        def progress(epoch, stats):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"epoch {epoch + 1}: {stats.rows} rows, {stats.chunks} chunks")
+
+        started = time.perf_counter()
+        try:
+            model, stats = train_streaming(
+                chunks, epochs=max(options["epochs"], 1), alpha=options["alpha"],
+                n_features=2 ** options["hash_bits"], on_chunk=progress,
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        path = options["output"] or getattr(settings, "PARKING_MODEL_PATH", DEFAULT_MODEL_PATH)
+        save_model(model, path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {stats.rows} rows in {time.perf_counter() - started:.1f}s "
+            f"(progressive accuracy {stats.accuracy:.3f}, log-loss {stats.log_loss:.3f}) → {path}. "
+            "Run score_bays to refresh precomputed scores."
+        ))
@@ -0,0 +1,68 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+
+INPUT_COLUMNS = ['zone_number', 'kerbsideid', 'hour', 'dow']
+N_CYCLICAL = 4
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+def _hash(values, salt):
+    # splitmix64 finaliser: a well-spread 64-bit hash of each integer, vectorised.
+    z = values.astype(np.uint64) + np.uint64((salt * _GOLDEN) & _MASK)
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+class BayFeatures(TransformerMixin, BaseEstimator):
+    """
+    Stateless encoder from (zone_number, kerbsideid, hour, dow) to a sparse CSR matrix:
+    sin/cos of hour and day of week, plus hashed one-hot columns for the zone, the bay
+    and the zone × hour cross (a per-zone daily profile). Nothing is learned in `fit`,
+    so the same encoder works for full fits and chunked `partial_fit` training.
+    """
+
+    def __init__(self, n_features=2 ** 18):
+        self.n_features = n_features
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.array(INPUT_COLUMNS, dtype=object)
+        self.n_features_in_ = len(INPUT_COLUMNS)
+        return self
+
+    def transform(self, X):
+        zone = np.asarray(X['zone_number'], dtype=np.int64)
+        bay = np.asarray(X['kerbsideid'], dtype=np.int64)
+        hour = np.asarray(X['hour'], dtype=np.int64)
+        dow = np.asarray(X['dow'], dtype=np.int64)
+        n = len(zone)
+
+        buckets = np.uint64(self.n_features)
+        hashed = np.column_stack([
+            _hash(zone, 1) % buckets,
+            _hash(bay, 2) % buckets,
+            _hash(zone * 24 + hour, 3) % buckets,
+        ]).astype(np.int64) + N_CYCLICAL
+        cyclical = np.column_stack([
+            np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24),
+            np.sin(2 * np.pi * dow / 7), np.cos(2 * np.pi * dow / 7),
+        ])
+
+        per_row = N_CYCLICAL + hashed.shape[1]
+        indices = np.hstack([np.broadcast_to(np.arange(N_CYCLICAL), (n, N_CYCLICAL)), hashed]).ravel()
+        data = np.hstack([cyclical, np.ones(hashed.shape)]).ravel()
+        indptr = np.arange(0, n * per_row + 1, per_row)
+        return sp.csr_matrix((data, indices, indptr), shape=(n, N_CYCLICAL + self.n_features))
+
+def build_pipeline(estimator=None, n_features=2 ** 18):
+    """Encoder + classifier as one Pipeline, saved and loaded as a single artifact."""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ('features', BayFeatures(n_features=n_features)),
+        ('clf', estimator if estimator is not None else LogisticRegression(max_iter=1000)),
+    ])
@@ -1,46 +1,87 @@
+import numpy as np
 import pandas as pd
 import json
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from datetime import datetime
 import os
 import joblib
 
+from .features import INPUT_COLUMNS as FEATURES, build_pipeline
+from .scores import time_slot
+from .training import prepare_chunk
+
 class ParkingPredictor:
     def __init__(self):
-        self.model = LogisticRegression()
+        self.model = build_pipeline()
 
     def preprocess(self, data):
-        # Extract hour from status_timestamp
-        data['hour'] = data['status_timestamp'].apply(
-            lambda x: datetime.fromisoformat(x.split('+')[0]).hour
-        )
-        # Select features
-        X = data[['zone_number', 'kerbsideid', 'hour']]
-        # Target: 1 if Unoccupied, 0 otherwise
-        y = data['status_description'].apply(
-            lambda x: 1 if x.lower() == 'unoccupied' else 0
-        )
-        # Drop rows with NaN values in features
-        mask = X.notnull().all(axis=1)
-        X = X[mask]
-        y = y[mask]
-        return X, y
+        # Vectorised hour / label extraction; rows with missing features are dropped.
+        frame = prepare_chunk(data)
+        return frame[FEATURES], frame['available']
 
     def train(self, data):
+        # model_selection drags in scipy.stats; only training needs it.
+        from sklearn.model_selection import train_test_split
+
         X, y = self.preprocess(data)
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         self.model.fit(X_train, y_train)
         print(f"Training accuracy: {self.model.score(X_test, y_test):.2f}")
 
+    @staticmethod
+    def _hour(dt):
+        return time_slot(dt)[1]
+
+    @property
+    def features(self):
+        return list(getattr(self.model, 'feature_names_in_', FEATURES))
+
+    @property
+    def uses_dow(self):
+        return 'dow' in self.features
+
+    def _frame(self, zone_numbers, kerbsideids, hours, dows):
+        columns = {'zone_number': zone_numbers, 'kerbsideid': kerbsideids, 'hour': hours, 'dow': dows}
+        return pd.DataFrame({name: columns[name] for name in self.features})
+
     def predict_proba(self, zone_number, kerbsideid, dt):
-        hour = datetime.fromisoformat(dt.split('+')[0]).hour
-        X_pred = pd.DataFrame(
-            [[zone_number, kerbsideid, hour]],
-            columns=['zone_number', 'kerbsideid', 'hour']
+        dow, hour = time_slot(dt)
+        X_pred = self._frame([zone_number], [kerbsideid], [hour], [dow])
+        return self.model.predict_proba(X_pred)
+
+    def predict_proba_many(self, zone_numbers, kerbsideids, dt):
+        # One frame and one model call for every bay; the timestamp is parsed once.
+        zone_numbers = np.asarray(zone_numbers, dtype=np.int64)
+        kerbsideids = np.asarray(kerbsideids, dtype=np.int64)
+        if not len(zone_numbers):
+            return np.empty((0, len(self.model.classes_)))
+        dow, hour = time_slot(dt)
+        n = len(zone_numbers)
+        X_pred = self._frame(
+            zone_numbers, kerbsideids,
+            np.full(n, hour, dtype=np.int64), np.full(n, dow, dtype=np.int64),
         )
         return self.model.predict_proba(X_pred)
 
+    def score_hours(self, zone_numbers, kerbsideids):
+        """
+        P(available) for every bay at every hour (and day of week when the model has
+        that feature) in one model call: an array of shape (bays, 7 or 1, 24).
+        """
+        zone_numbers = np.asarray(zone_numbers, dtype=np.int64)
+        kerbsideids = np.asarray(kerbsideids, dtype=np.int64)
+        days = 7 if self.uses_dow else 1
+        slots = days * 24
+        n = len(zone_numbers)
+        if not n:
+            return np.empty((0, days, 24))
+        X_pred = self._frame(
+            np.repeat(zone_numbers, slots),
+            np.repeat(kerbsideids, slots),
+            np.tile(np.arange(slots, dtype=np.int64) % 24, n),
+            np.tile(np.arange(slots, dtype=np.int64) // 24, n),
+        )
+        available = list(self.model.classes_).index(1)
+        return self.model.predict_proba(X_pred)[:, available].reshape(n, days, 24)
+
     def save(self, path):
         joblib.dump(self.model, path)
         print(f"Model saved to {path}")
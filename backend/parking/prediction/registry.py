@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+import time
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'parking_model.joblib')
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ModelRegistry:
+    """
+    Loads the parking model once per process and shares it across requests.
+    pandas / scikit-learn / joblib are imported on the first `get()`, not with this
+    module, so workers that never predict don't pay for them.
+    The file's mtime/size is polled at most every `check_interval` seconds; when it
+    changes and the content hash differs, a new predictor is loaded and swapped in
+    with a single reference assignment, so in-flight requests keep the old one.
+    Only the first load blocks callers; during a reload they get the current model.
+    """
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, check_interval=30):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._predictor = None
+        self._stat = None
+        self._digest = None
+        self._checked_at = 0.0
+
+    @property
+    def digest(self):
+        return self._digest
+
+    def get(self):
+        predictor = self._predictor
+        if predictor is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return predictor
+        if predictor is not None:
+            # A good model is loaded: let one thread re-check and reload it while the
+            # rest keep serving the current one instead of queueing on the lock.
+            if not self._lock.acquire(blocking=False):
+                return predictor
+            try:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._refresh()
+                return self._predictor
+            finally:
+                self._lock.release()
+        with self._lock:
+            if self._predictor is None or time.monotonic() - self._checked_at >= self.check_interval:
+                self._refresh()
+            return self._predictor
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            if self._predictor is None:
+                raise
+            # Keep serving the last good model while a new file is being dropped in.
+            self._checked_at = time.monotonic()
+            return
+        stat = (st.st_mtime_ns, st.st_size)
+        if self._predictor is None or stat != self._stat:
+            digest = _file_digest(self.path)
+            if self._predictor is None or digest != self._digest:
+                import joblib
+
+                from .main import ParkingPredictor
+
+                predictor = ParkingPredictor()
+                try:
+                    predictor.model = joblib.load(self.path)
+                except Exception:
+                    if self._predictor is None:
+                        raise
+                    # Partially written artifact: retry on the next check.
+                    self._checked_at = time.monotonic()
+                    return
+                self._predictor, self._digest = predictor, digest
+            self._stat = stat
+        self._checked_at = time.monotonic()
+
+    def reload(self):
+        """Force a re-check of the model file on the next `get()`."""
+        with self._lock:
+            self._checked_at = 0.0
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_registry():
+    global _default
+    if _default is None:
+        from django.conf import settings
+        with _default_lock:
+            if _default is None:
+                _default = ModelRegistry(
+                    path=getattr(settings, "PARKING_MODEL_PATH", DEFAULT_MODEL_PATH),
+                    check_interval=getattr(settings, "PARKING_MODEL_CHECK_SECONDS", 30),
+                )
+    return _default
+
+def get_predictor():
+    """Shared ParkingPredictor for this worker; hot-reloads when the model file changes."""
+    return get_registry().get()
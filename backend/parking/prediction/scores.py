@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_SCORES_PATH = os.path.join(os.path.dirname(__file__), 'parking_scores.npz')
+
+def time_slot(dt):
+    """
+    (day of week 0=Mon..6=Sun, hour) of a datetime or ISO timestamp string on the bays'
+    local clock, PARKING_LOCAL_TIME_ZONE. API datetimes arrive aware (DRF makes them UTC)
+    and are converted; only naive values from other callers are read as local wall-clock
+    time. training.parse_local_times applies the same rule to training rows.
+    """
+    if not hasattr(dt, 'hour'):
+        dt = datetime.fromisoformat(dt)
+    if dt.tzinfo is not None and dt.utcoffset() is not None:
+        from zoneinfo import ZoneInfo
+
+        from django.conf import settings
+
+        dt = dt.astimezone(ZoneInfo(getattr(settings, 'PARKING_LOCAL_TIME_ZONE', 'Australia/Melbourne')))
+    return dt.weekday(), dt.hour
+
+def write_scores(path, bay_ids, zone_numbers, probs, model_digest):
+    """
+    Write a score table atomically: `probs` is (bays, days, 24) with days = 7 when the
+    model uses day of week and 1 otherwise. Bays are stored sorted by id.
+    """
+    order = np.argsort(bay_ids, kind='stable')
+    meta = {
+        'model_digest': model_digest,
+        'generated_at': datetime.utcnow().isoformat(),
+        'by_dow': probs.shape[1] == 7,
+    }
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(
+                f,
+                bay_ids=np.asarray(bay_ids, dtype=np.int64)[order],
+                zone_numbers=np.asarray(zone_numbers, dtype=np.int64)[order],
+                probs=np.asarray(probs, dtype=np.float32)[order],
+                meta=np.array(json.dumps(meta)),
+            )
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+class ScoreTable:
+    """
+    Precomputed P(available) per bay × (day of week ×) hour, written by
+    `manage.py score_bays`. Like ModelRegistry it re-stats its file (and the model
+    file) at most every `check_interval` seconds and swaps in a new table when either
+    changed. A table scored by a different model than the one on disk is ignored.
+    """
+
+    def __init__(self, path=DEFAULT_SCORES_PATH, model_path=None, check_interval=30):
+        self.path = path
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._table = None
+        self._stat = None
+        self._checked_at = 0.0
+
+    def _stats(self):
+        stats = []
+        for path in (self.path, self.model_path):
+            try:
+                st = os.stat(path)
+                stats.append((st.st_mtime_ns, st.st_size))
+            except (OSError, TypeError):
+                stats.append(None)
+        return tuple(stats)
+
+    def _load(self):
+        from .registry import _file_digest
+
+        try:
+            with np.load(self.path) as data:
+                table = {k: data[k] for k in ('bay_ids', 'zone_numbers', 'probs')}
+                table['meta'] = json.loads(str(data['meta']))
+            if self.model_path and table['meta']['model_digest'] != _file_digest(self.model_path):
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return table
+
+    def get(self):
+        """The current table as a dict of arrays, or None when there is no usable one."""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._table
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                stat = self._stats()
+                if stat != self._stat:
+                    self._table = self._load() if stat[0] is not None else None
+                    self._stat = stat
+                self._checked_at = time.monotonic()
+            return self._table
+
+    def lookup(self, kerbside_ids, zone_numbers, dt):
+        """
+        Probabilities for the given bays at `dt`; NaN where the table has no score
+        (new bay, zone changed since scoring, or no table at all).
+        """
+        kerbside_ids = np.asarray(kerbside_ids, dtype=np.int64)
+        out = np.full(len(kerbside_ids), np.nan)
+        table = self.get()
+        if table is None or not len(kerbside_ids) or not len(table['bay_ids']):
+            return out
+        dow, hour = time_slot(dt)
+        day = dow if table['meta']['by_dow'] else 0
+        pos = np.minimum(np.searchsorted(table['bay_ids'], kerbside_ids), len(table['bay_ids']) - 1)
+        hit = (table['bay_ids'][pos] == kerbside_ids) & (table['zone_numbers'][pos] == np.asarray(zone_numbers, dtype=np.int64))
+        out[hit] = table['probs'][pos[hit], day, hour]
+        return out
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_score_table():
+    global _default
+    if _default is None:
+        from django.conf import settings
+
+        from .registry import DEFAULT_MODEL_PATH
+        with _default_lock:
+            if _default is None:
+                _default = ScoreTable(
+                    path=getattr(settings, "PARKING_SCORES_PATH", DEFAULT_SCORES_PATH),
+                    model_path=getattr(settings, "PARKING_MODEL_PATH", DEFAULT_MODEL_PATH),
+                    check_interval=getattr(settings, "PARKING_SCORES_CHECK_SECONDS", 30),
+                )
+    return _default
@@ -0,0 +1,122 @@
+import time
+from collections import deque
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from .features import INPUT_COLUMNS, build_pipeline
+from .training import prepare_chunk
+
+def _logreg(C):
+    from sklearn.linear_model import LogisticRegression
+    return LogisticRegression(C=C, max_iter=1000)
+
+def _sgd(alpha):
+    from sklearn.linear_model import SGDClassifier
+    return SGDClassifier(loss='log_loss', alpha=alpha, random_state=42)
+
+# name -> (estimator factory, parameter grid); each grid point is also tried per hash width.
+CANDIDATES = {
+    'logreg': (_logreg, {'C': [0.1, 1.0, 10.0]}),
+    'sgd': (_sgd, {'alpha': [1e-5, 1e-4, 1e-3]}),
+}
+HASH_BITS = (16, 18)
+
+def candidates(names=None, hash_bits=HASH_BITS):
+    """Every (name, params, hash_bits) combination to evaluate."""
+    out = []
+    for name, (_, grid) in CANDIDATES.items():
+        if names and name not in names:
+            continue
+        keys = sorted(grid)
+        for values in product(*(grid[k] for k in keys)):
+            for bits in hash_bits:
+                out.append((name, dict(zip(keys, values)), bits))
+    return out
+
+def make_model(name, params, bits):
+    factory = CANDIDATES[name][0]
+    return build_pipeline(factory(**params), n_features=2 ** bits)
+
+def load_recent(chunks, max_rows):
+    """
+    Prepared rows of the newest `max_rows` rows in the history stream; older chunks are
+    dropped as newer ones arrive, so memory stays bounded by `max_rows`.
+    """
+    kept, total = deque(), 0
+    for raw in chunks:
+        chunk = prepare_chunk(raw)
+        if chunk.empty:
+            continue
+        kept.append(chunk)
+        total += len(chunk)
+        while total - len(kept[0]) >= max_rows:
+            total -= len(kept.popleft())
+    if not kept:
+        raise ValueError("No usable training rows")
+    return pd.concat(kept, ignore_index=True).tail(max_rows).reset_index(drop=True)
+
+def latency_per_1k(model, data, repeat=5):
+    """Best-of-`repeat` milliseconds to score 1000 bays at one time slot."""
+    sample = data[INPUT_COLUMNS].sample(n=1000, replace=len(data) < 1000, random_state=0)
+    sample = sample.assign(hour=12, dow=2)
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        model.predict_proba(sample)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def evaluate(name, params, bits, data, train_idx, test_idx, measure_latency):
+    """Fit one candidate on one fold; returns its metrics (and latency on the first fold)."""
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    X, y = data[INPUT_COLUMNS], data['available'].to_numpy()
+    model = make_model(name, params, bits)
+    started = time.perf_counter()
+    model.fit(X.iloc[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - started
+    proba = model.predict_proba(X.iloc[test_idx])[:, list(model.classes_).index(1)]
+    y_test = y[test_idx]
+    return {
+        'fit_seconds': fit_seconds,
+        'log_loss': log_loss(y_test, proba, labels=[0, 1]),
+        'auc': roc_auc_score(y_test, proba) if len(np.unique(y_test)) > 1 else float('nan'),
+        'latency_ms_per_1k': latency_per_1k(model, data) if measure_latency else None,
+    }
+
+def run_sweep(data, grid, folds=3, n_jobs=-1):
+    """
+    Cross-validate every candidate of `grid` on `data`, one (candidate, fold) fit per
+    joblib task across `n_jobs` processes. Returns one result dict per candidate.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(data, data['available']))
+    tasks = [(c, f) for c in range(len(grid)) for f in range(len(splits))]
+    started = time.perf_counter()
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate)(*grid[c], data, *splits[f], f == 0) for c, f in tasks
+    )
+    wall_seconds = time.perf_counter() - started
+
+    results = []
+    for c, (name, params, bits) in enumerate(grid):
+        per_fold = [s for (ci, _), s in zip(tasks, scores) if ci == c]
+        results.append({
+            'estimator': name,
+            'params': params,
+            'hash_bits': bits,
+            'log_loss': float(np.mean([s['log_loss'] for s in per_fold])),
+            'auc': float(np.nanmean([s['auc'] for s in per_fold])),
+            'fit_seconds': float(np.mean([s['fit_seconds'] for s in per_fold])),
+            'latency_ms_per_1k': per_fold[0]['latency_ms_per_1k'],
+        })
+    return results, wall_seconds
+
+def pick_best(results, max_latency_ms=None):
+    """Lowest log-loss among candidates within the latency budget (all if none fit it)."""
+    eligible = [r for r in results if max_latency_ms is None or r['latency_ms_per_1k'] <= max_latency_ms]
+    return min(eligible or results, key=lambda r: (r['log_loss'], r['latency_ms_per_1k']))
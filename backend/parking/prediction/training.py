@@ -0,0 +1,174 @@
+import math
+import os
+import tempfile
+from datetime import timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Columns every chunk is reduced to before training; `available` is the target.
+TRAIN_COLUMNS = ['zone_number', 'kerbsideid', 'hour', 'dow', 'available']
+CHUNK_ROWS = 50_000
+
+def parse_local_times(values):
+    """
+    Wall-clock times of `values` on the bays' local clock, PARKING_LOCAL_TIME_ZONE, as
+    naive datetimes; the vectorised counterpart of scores.time_slot. Timestamps with a
+    UTC offset (or 'Z') are converted, naive ones are taken as already local.
+    Unparseable values become NaT.
+    """
+    from django.conf import settings
+
+    tz = getattr(settings, 'PARKING_LOCAL_TIME_ZONE', 'Australia/Melbourne')
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.tz_convert(tz).dt.tz_localize(None) if values.dt.tz is not None else values
+    text = values.astype(str).str.strip()
+    aware = text.str.contains(r'(?:Z|[+-]\d{2}:?\d{2})$', regex=True)
+    converted = pd.to_datetime(text.where(aware), utc=True, format='ISO8601', errors='coerce')
+    local = pd.to_datetime(text.where(~aware), format='ISO8601', errors='coerce')
+    return local.where(~aware, converted.dt.tz_convert(tz).dt.tz_localize(None))
+
+def prepare_chunk(data):
+    """
+    Reduce a raw chunk (data.json / export columns: zone_number, kerbsideid,
+    status_timestamp, status_description) to TRAIN_COLUMNS, dropping incomplete rows.
+    """
+    ts = parse_local_times(data['status_timestamp'])
+    if 'available' in data:
+        available = pd.to_numeric(data['available'], errors='coerce')
+    else:
+        available = data['status_description'].astype(str).str.lower().eq('unoccupied').astype('int8')
+    frame = pd.DataFrame({
+        'zone_number': pd.to_numeric(data['zone_number'], errors='coerce'),
+        'kerbsideid': pd.to_numeric(data['kerbsideid'], errors='coerce'),
+        'hour': ts.dt.hour,
+        'dow': ts.dt.dayofweek,
+        'available': available,
+    })
+    frame = frame.dropna()
+    return frame.astype({'zone_number': 'int64', 'kerbsideid': 'int64', 'hour': 'int64', 'dow': 'int64', 'available': 'int8'})
+
+def iter_file(path, chunk_rows=CHUNK_ROWS):
+    """
+    Raw chunks of at most `chunk_rows` rows from a .jsonl / .csv export. A plain .json
+    array (the original data.json) can't be streamed and is read whole, then split.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows, dtype=False)
+    elif ext == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str)
+    elif ext == '.json':
+        data = pd.read_json(path, dtype=False)
+        for start in range(0, len(data), chunk_rows):
+            yield data.iloc[start:start + chunk_rows]
+    else:
+        raise ValueError(f"Unsupported training file {path!r}: expected .jsonl, .csv or .json")
+
+def iter_ops_bay_status(since, until, chunk_rows=CHUNK_ROWS, window=timedelta(days=1)):
+    """
+    Raw chunks straight from ops_bay_status, read one `window` at a time (like the
+    hourly rollup) so at most one window's rows are ever buffered. Zones come from the
+    bay list; rows for bays it doesn't know are skipped.
+    """
+    from django.db import connection
+
+    from ..history_sql import OCC_CASE, _iso, _t
+    from ..models import Parking
+
+    zones = {}
+    for kerbside_id, zone_number in Parking.objects.values_list('kerbside_id', 'zone_number'):
+        try:
+            zones[str(kerbside_id)] = int(float(zone_number))
+        except (TypeError, ValueError):
+            pass
+
+    sql = f"""
+    SELECT o.bay_id, o.status_ts, 1 - ({OCC_CASE}) AS available
+    FROM {_t('ops_bay_status')} o
+    WHERE o.status_ts >= %s AND o.status_ts < %s
+    """
+    start = since
+    while start < until:
+        end = min(start + window, until)
+        with connection.cursor() as cur:
+            cur.execute(sql, [_iso(start), _iso(end)])
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                raw = pd.DataFrame(rows, columns=['kerbsideid', 'status_timestamp', 'available'])
+                raw['zone_number'] = raw['kerbsideid'].astype(str).map(zones)
+                # Stored in UTC (USE_TZ); parse_local_times moves them onto the local clock.
+                raw['status_timestamp'] = pd.to_datetime(raw['status_timestamp'], utc=True)
+                yield raw
+        start = end
+
+class StreamStats:
+    """Progressive validation: each chunk is scored before the model learns from it."""
+
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.correct = 0
+        self.log_loss_sum = 0.0
+        self.scored = 0
+
+    def update(self, y, proba):
+        proba = np.clip(proba, 1e-15, 1 - 1e-15)
+        self.correct += int(((proba >= 0.5) == (y == 1)).sum())
+        self.log_loss_sum += float(-(y * np.log(proba) + (1 - y) * np.log(1 - proba)).sum())
+        self.scored += len(y)
+
+    @property
+    def accuracy(self):
+        return self.correct / self.scored if self.scored else math.nan
+
+    @property
+    def log_loss(self):
+        return self.log_loss_sum / self.scored if self.scored else math.nan
+
+def train_streaming(chunks, epochs=1, alpha=1e-4, n_features=2 ** 18, on_chunk=None):
+    """
+    Fit an incremental model over an iterable of raw chunks (or a callable returning a
+    fresh one per epoch) with `partial_fit`, so memory is bounded by the chunk size,
+    not the history length. Returns (fitted Pipeline, StreamStats of the last epoch).
+    """
+    from sklearn.linear_model import SGDClassifier
+
+    from .features import INPUT_COLUMNS, build_pipeline
+
+    pipeline = build_pipeline(SGDClassifier(loss='log_loss', alpha=alpha, random_state=42), n_features)
+    encoder, clf = pipeline.named_steps['features'], pipeline.named_steps['clf']
+    encoder.fit(None)  # stateless: only records the input columns
+    classes = np.array([0, 1])
+    stats = StreamStats()
+    for epoch in range(epochs):
+        stats = StreamStats()
+        for raw in (chunks() if callable(chunks) else chunks):
+            chunk = prepare_chunk(raw)
+            if chunk.empty:
+                continue
+            X, y = encoder.transform(chunk[INPUT_COLUMNS]), chunk['available'].to_numpy()
+            if hasattr(clf, 'coef_'):
+                stats.update(y, clf.predict_proba(X)[:, 1])
+            clf.partial_fit(X, y, classes=classes)
+            stats.rows += len(chunk)
+            stats.chunks += 1
+            if on_chunk:
+                on_chunk(epoch, stats)
+    if not hasattr(clf, 'coef_'):
+        raise ValueError("No usable training rows")
+    return pipeline, stats
+
+def save_model(model, path):
+    """Dump atomically so a ModelRegistry polling `path` never reads a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.joblib')
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
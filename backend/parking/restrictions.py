@@ -0,0 +1,123 @@
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+# The week in 15-minute slots, Monday 00:00 first; one bit per slot, packed 8 to a byte.
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+MASK_BYTES = WEEK_SLOTS // 8
+
+_DAYS = {"M": 0, "MO": 0, "MON": 0, "TU": 1, "TUE": 1, "W": 2, "WED": 2, "TH": 3, "THU": 3,
+         "F": 4, "FRI": 4, "SA": 5, "SAT": 5, "SU": 6, "SUN": 6}
+_DAY = r"(?:MON|TUE|WED|THU|FRI|SAT|SUN)[A-Z]*|MO|TU|TH|SA|SU|M|W|F"
+_DAY_RANGE = re.compile(rf"^({_DAY})(?:-({_DAY}))?$")
+_CLOCK = r"(\d{1,2})(?:[:.](\d{2}))?\s*(AM|PM)?"
+_TIME_RANGE = re.compile(rf"\b{_CLOCK}\s*(?:-|\bTO\b)\s*{_CLOCK}\b")
+# Signs a general driver can't park under while they apply: loading, no stopping/parking,
+# clearway, disabled, bus and taxi zones, permit-only (PP), healthcare (HP) and
+# special-purpose (SP) bays. Quick stop (QP) bays are short-stay but open to anyone, so
+# like FP/MP and the timed signs they don't restrict.
+_NO_PARKING = re.compile(
+    r"^(LZ|NS|NP|CW|DP|DIS|BZ|TZ|PP|HP|SP)|\b(LOADING|NO STOP|NO PARK|CLEARWAY|DISABLED|BUS\b|TAXI|PERMIT)"
+)
+
+def _day(token):
+    return _DAYS.get(token, _DAYS.get(token[:3]))
+
+def parse_days(text):
+    """
+    Weekdays (0=Mon) named by 'Mon-Fri', 'Monday to Friday', 'M-SAT', 'Mon,Wed', ...;
+    None if none are.
+    """
+    days = set()
+    text = re.sub(r"\s*(?:-|\bTO\b)\s*", "-", (text or "").upper())
+    for part in re.split(r"[,&/\s]+", text):
+        match = _DAY_RANGE.match(part)
+        if not match:
+            continue
+        first = _day(match.group(1))
+        last = _day(match.group(2)) if match.group(2) else first
+        if first is None or last is None:
+            continue
+        days.update((first + i) % 7 for i in range((last - first) % 7 + 1))
+    return days or None
+
+def _clock_minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem == "PM" and hour < 12:
+        hour += 12
+    elif meridiem == "AM" and hour == 12:
+        hour = 0
+    return min(hour * 60 + minute, 24 * 60)
+
+def parse_times(text):
+    """(start, end) minutes since midnight of the first 'H:MM-H:MM' / 'H:MM to H:MM' range in `text`, or None."""
+    match = _TIME_RANGE.search((text or "").upper())
+    if not match:
+        return None
+    return _clock_minutes(*match.group(1, 2, 3)), _clock_minutes(*match.group(4, 5, 6))
+
+def prohibits_parking(sign_text):
+    return bool(sign_text) and bool(_NO_PARKING.search(sign_text.strip().upper()))
+
+def allowed_slots(sign_text, days_of_week, start_time, end_time):
+    """
+    Boolean (WEEK_SLOTS,) array of the slots a general driver may park in.
+    Time-limited signs (2P, 1P MTR, ...) allow parking, so only no-parking kinds restrict
+    their window. Days come from `days_of_week`, else the sign, else every day; times from
+    start/end_time, else the sign, else all day. A window ending at or before its start
+    runs past midnight. Partly restricted slots count as restricted.
+    """
+    allowed = np.ones(WEEK_SLOTS, dtype=bool)
+    if not prohibits_parking(sign_text):
+        return allowed
+    days = parse_days(days_of_week) or parse_days(sign_text) or set(range(7))
+    if start_time is not None and end_time is not None:
+        start, end = start_time.hour * 60 + start_time.minute, end_time.hour * 60 + end_time.minute
+    else:
+        start, end = parse_times(sign_text) or (0, 24 * 60)
+    if end <= start:
+        end += 24 * 60
+    first, stop = start // SLOT_MINUTES, -(-end // SLOT_MINUTES)
+    for day in days:
+        offset = day * SLOTS_PER_DAY
+        allowed[np.arange(offset + first, offset + stop) % WEEK_SLOTS] = False
+    return allowed
+
+def restriction_masks(rows):
+    """
+    Packed (len(rows), MASK_BYTES) uint8 allowed-slot masks for BayRows. Each distinct
+    sign / days / times combination is parsed once; most bays share one with their street.
+    """
+    parsed = {}
+    masks = np.empty((len(rows), MASK_BYTES), dtype=np.uint8)
+    for i, row in enumerate(rows):
+        key = (row.sign_text, row.days_of_week, row.start_time, row.end_time)
+        mask = parsed.get(key)
+        if mask is None:
+            mask = parsed[key] = np.packbits(allowed_slots(*key))
+        masks[i] = mask
+    return masks
+
+def week_slot(dt=None):
+    """
+    Week slot of `dt` (default now) on the bays' local clock, PARKING_LOCAL_TIME_ZONE.
+    API datetimes arrive aware (DRF makes them UTC) and are converted; only naive values
+    from other callers are read as local wall-clock time.
+    """
+    if dt is None:
+        dt = timezone.now()
+    elif isinstance(dt, str):
+        dt = datetime.fromisoformat(dt)
+    if timezone.is_aware(dt):
+        dt = dt.astimezone(ZoneInfo(getattr(settings, "PARKING_LOCAL_TIME_ZONE", "Australia/Melbourne")))
+    return dt.weekday() * SLOTS_PER_DAY + (dt.hour * 60 + dt.minute) // SLOT_MINUTES
+
+def allowed_at(masks, slot):
+    """Boolean array: which of the packed `masks` allow parking in week slot `slot`."""
+    return (masks[:, slot >> 3] >> (7 - (slot & 7))) & 1 == 1
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.db import DatabaseError, transaction
+
+from .history_sql import OCC_CASE, _iso, _run, _t
+
+HOURLY_TABLE = "agg_bay_hourly"
+WATERMARK_TABLE = "agg_rollup_watermark"
+HOURLY_ROLLUP = "bay_hourly"
+
+def create_tables_sql() -> list:
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {_t(HOURLY_TABLE)} (
+            bay_id    VARCHAR(64) NOT NULL,
+            hour_ts   DATETIME    NOT NULL,
+            samples   INT         NOT NULL DEFAULT 0,
+            free_obs  INT         NOT NULL DEFAULT 0,
+            occ_obs   INT         NOT NULL DEFAULT 0,
+            PRIMARY KEY (bay_id, hour_ts),
+            KEY idx_hour (hour_ts)
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {_t(WATERMARK_TABLE)} (
+            name       VARCHAR(64) NOT NULL PRIMARY KEY,
+            last_ts    DATETIME    NOT NULL,
+            updated_at DATETIME    NOT NULL
+        )
+        """,
+    ]
+
+def ensure_tables() -> None:
+    for sql in create_tables_sql():
+        _run(sql, [])
+
+def get_watermark(name: str = HOURLY_ROLLUP) -> Optional[datetime]:
+    rows = _run(f"SELECT last_ts FROM {_t(WATERMARK_TABLE)} WHERE name = %s", [name])
+    return rows[0][0] if rows else None
+
+def _set_watermark(name: str, ts: datetime) -> None:
+    _run(
+        f"""
+        INSERT INTO {_t(WATERMARK_TABLE)} (name, last_ts, updated_at) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE last_ts = VALUES(last_ts), updated_at = VALUES(updated_at)
+        """,
+        [name, _iso(ts), _iso(datetime.utcnow())],
+    )
+
+def _floor_hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def _fold_sql(where: str = "o.status_ts > %s AND o.status_ts <= %s") -> str:
+    # Adds the counts of raw rows matching `where` onto existing hourly buckets.
+    return f"""
+    INSERT INTO {_t(HOURLY_TABLE)} (bay_id, hour_ts, samples, free_obs, occ_obs)
+    SELECT bay_id, hour_ts, COUNT(*), SUM(1 - occ), SUM(occ)
+    FROM (
+        SELECT o.bay_id AS bay_id,
+               DATE_FORMAT(o.status_ts, '%%Y-%%m-%%d %%H:00:00') AS hour_ts,
+               {OCC_CASE} AS occ
+        FROM {_t('ops_bay_status')} o
+        WHERE {where}
+    ) raw
+    GROUP BY bay_id, hour_ts
+    ON DUPLICATE KEY UPDATE
+        samples  = samples  + VALUES(samples),
+        free_obs = free_obs + VALUES(free_obs),
+        occ_obs  = occ_obs  + VALUES(occ_obs)
+    """
+
+def fold_hourly(until: Optional[datetime] = None, since: Optional[datetime] = None,
+                batch: timedelta = timedelta(days=1)) -> Dict[str, str]:
+    """
+    Fold raw status rows newer than the watermark into the hourly rollup.
+    Works in `batch`-sized windows; each window and its watermark move commit together,
+    so an interrupted run resumes where it stopped. `since` is only used on the first run.
+    """
+    until = until or datetime.utcnow()
+    start = get_watermark()
+    if start is None:
+        if since is None:
+            rows = _run(f"SELECT MIN(status_ts) FROM {_t('ops_bay_status')}", [])
+            first = rows[0][0] if rows else None
+            if first is None:
+                return {"from": None, "to": None, "windows": 0}
+            since = first - timedelta(seconds=1)
+        start = since
+
+    begin, windows = start, 0
+    while start < until:
+        end = min(start + batch, until)
+        with transaction.atomic():
+            _run(_fold_sql(), [_iso(start), _iso(end)])
+            _set_watermark(HOURLY_ROLLUP, end)
+        start, windows = end, windows + 1
+    return {"from": _iso(begin), "to": _iso(start), "windows": windows}
+
+def rebuild_hourly(since: datetime, until: datetime) -> None:
+    """
+    Recompute whole hours in [since, until) from raw rows, e.g. after late-arriving data.
+    `until` is clamped to the watermark's hour so the next incremental fold can't double count.
+    Stored heatmaps covering the rebuilt hours are reset so they get recomputed too.
+    """
+    from .heatmaps import invalidate
+
+    since, until = _floor_hour(since), _floor_hour(until)
+    watermark = get_watermark()
+    if watermark is None:
+        return
+    until = min(until, _floor_hour(watermark))
+    if since >= until:
+        return
+    with transaction.atomic():
+        _run(f"DELETE FROM {_t(HOURLY_TABLE)} WHERE hour_ts >= %s AND hour_ts < %s", [_iso(since), _iso(until)])
+        _run(_fold_sql("o.status_ts >= %s AND o.status_ts < %s"), [_iso(since), _iso(until)])
+        try:
+            with transaction.atomic():
+                invalidate(since, until)
+        except DatabaseError:
+            # Heatmap store not created: nothing materialised to reset.
+            pass
+
+def hourly_rollup_sql_for_scope(sb_sql: str) -> str:
+    """Same output columns as the raw hourly query, read from the rollup for hours in [start, stop)."""
+    return f"""
+    WITH scoped_bays AS {sb_sql}
+    SELECT DATE_FORMAT(h.hour_ts, '%%Y-%%m-%%d %%H:00:00') AS hour,
+           SUM(h.samples)  AS samples,
+           SUM(h.free_obs) AS free_obs,
+           SUM(h.occ_obs)  AS occ_obs
+    FROM {_t(HOURLY_TABLE)} h
+    JOIN scoped_bays sb ON sb.bay_id = h.bay_id
+    WHERE h.hour_ts >= %s AND h.hour_ts < %s
+    GROUP BY hour
+    ORDER BY hour;
+    """
+
+def rollup_until() -> Optional[datetime]:
+    """
+    Start of the watermark's hour: every hour before it is complete in the rollup, later
+    ones still need raw rows. None when nothing has been folded yet.
+    """
+    try:
+        watermark = get_watermark()
+    except Exception:
+        # Table not created yet (or no permission): fall back to raw scans.
+        return None
+    return None if watermark is None else _floor_hour(watermark)
@@ -1,5 +1,22 @@
+from collections import namedtuple
+
 from .models import Parking
 
+# Model columns in ParkingSerializer order; is_occupied is derived from status_description.
+BAY_FIELDS = (
+    "kerbside_id", "zone_number", "status_description", "status_timestamp", "latitude", "longitude",
+    "last_updated", "sign_text", "days_of_week", "start_time", "end_time",
+)
+
+class BayRow(namedtuple("BayRow", BAY_FIELDS)):
+    """One bay as a plain tuple: reads like a Parking instance, costs like a values_list row."""
+
+    __slots__ = ()
+
+    @property
+    def is_occupied(self):
+        return self.status_description == "Present"
+
 def parking_list(*, filters=None):
     filters = filters or {}
     qs = Parking.objects.all()
@@ -8,4 +25,8 @@ def parking_list(*, filters=None):
         qs = qs.filter(status_description=status)
     if filters:
         qs = qs.filter(**filters)
-    return qs
\ No newline at end of file
+    return qs
+
+def parking_rows(*, filters=None):
+    """`parking_list` as BayRow tuples straight from values_list, without model instances."""
+    return [BayRow._make(row) for row in parking_list(filters=filters).values_list(*BAY_FIELDS)]
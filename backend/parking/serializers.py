@@ -1,5 +1,9 @@
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .utils import inline_serializer
 
 class OriginSerializer(serializers.Serializer):
     latitude = serializers.FloatField()
@@ -8,6 +12,14 @@ class OriginSerializer(serializers.Serializer):
     formatted_address = serializers.CharField() 
 
 class ParkingSerializer(serializers.Serializer):
+    def __init__(self, *args, **kwargs):
+        # Optional `fields=[...]` keeps only those output fields.
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     kerbside_id = serializers.CharField()
     zone_number = serializers.CharField()
     status_description = serializers.CharField()
@@ -21,14 +33,88 @@ class ParkingSerializer(serializers.Serializer):
     start_time = serializers.TimeField(required=False, allow_null=True)
     end_time = serializers.TimeField(required=False, allow_null=True)
     
+class ParkingPageSerializer(serializers.Serializer):
+    results = ParkingSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
+
+class ParkingChangesSerializer(serializers.Serializer):
+    full = serializers.BooleanField()
+    changes = ParkingSerializer(many=True)
+    removed = serializers.ListField(child=serializers.CharField())
+    watermark = serializers.CharField()
+
+class ParkingNearbySpotSerializer(ParkingSerializer):
+    walk_time = serializers.FloatField()
+    distance_km = serializers.FloatField()
+    predicted_available_probability = serializers.FloatField()
+
 class ParkingNearbySerializer(serializers.Serializer):
     origin = OriginSerializer()
-    nearby = inline_serializer(
-        fields={
-            **{field: ParkingSerializer().fields[field] for field in ParkingSerializer().fields},
-            "walk_time": serializers.FloatField(),
-            "distance_km": serializers.FloatField(),
-            "predicted_available_probability": serializers.FloatField(),
-        },
-        many=True
-    )
+    nearby = ParkingNearbySpotSerializer(many=True)
+
+class ParkingNearbyBatchResultSerializer(serializers.Serializer):
+    origin = OriginSerializer(allow_null=True)
+    error = serializers.CharField(allow_null=True)
+    nearby = ParkingNearbySpotSerializer(many=True)
+
+class ParkingNearbyBatchSerializer(serializers.Serializer):
+    results = ParkingNearbyBatchResultSerializer(many=True)
+
+# -------------------- Fast path --------------------
+# Nearby responses can hold hundreds of spots, and per-field DRF serialization costs
+# more than finding them. These build the same dicts as ParkingNearbySpotSerializer
+# straight from BayRow tuples; keep them in step with the serializers above.
+
+_time = serializers.TimeField().to_representation
+
+def _str(value):
+    return None if value is None else str(value)
+
+def _float(value):
+    return None if value is None else float(value)
+
+def _datetime(value, tz):
+    # DateTimeField.to_representation with the current timezone resolved once by the
+    # caller instead of per value (a context-local lookup each time).
+    if not value:
+        return None
+    if tz is None:
+        value = timezone.make_naive(value, dt_timezone.utc) if timezone.is_aware(value) else value
+    else:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+@lru_cache(maxsize=32768)
+def _encode_bay(row, tz):
+    # The per-bay part of a spot; rows are immutable tuples and the same bays are served
+    # to request after request until the index refreshes, so this is memoised.
+    (kerbside_id, zone_number, status_description, status_timestamp, latitude, longitude,
+     last_updated, sign_text, days_of_week, start_time, end_time) = row
+    return {
+        "kerbside_id": _str(kerbside_id),
+        "zone_number": _str(zone_number),
+        "status_description": _str(status_description),
+        "status_timestamp": _datetime(status_timestamp, tz),
+        "latitude": _float(latitude),
+        "longitude": _float(longitude),
+        "last_updated": _datetime(last_updated, tz),
+        "is_occupied": status_description == "Present",
+        "sign_text": _str(sign_text),
+        "days_of_week": _str(days_of_week),
+        "start_time": None if start_time is None else _time(start_time),
+        "end_time": None if end_time is None else _time(end_time),
+    }
+
+def encode_nearby_spots(rows, distances_m, walk_times):
+    """One fresh spot dict per (BayRow, distance in metres, walk minutes)."""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    return [
+        {
+            **_encode_bay(row, tz),
+            "walk_time": walk_time,
+            "distance_km": distance_m / 1000,
+            "predicted_available_probability": None,
+        }
+        for row, distance_m, walk_time in zip(rows, distances_m, walk_times)
+    ]
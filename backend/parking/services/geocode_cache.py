@@ -0,0 +1,155 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .google_maps import AddressNotFound
+
+_WS = re.compile(r"\s+")
+_COMMA = re.compile(r"\s*,\s*")
+
+def normalise_address(address):
+    """Case/whitespace/punctuation-insensitive cache key for an address string."""
+    s = _WS.sub(" ", (address or "").strip().lower())
+    s = _COMMA.sub(", ", s)
+    return s.strip(" ,.;")
+
+class GeocodeCache:
+    """
+    Two-level geocode cache: a small in-process LRU in front of a Django cache backend.
+    Successful lookups live for `ttl` seconds; ZERO_RESULTS answers are cached as
+    negative entries for `negative_ttl` seconds and re-raised as AddressNotFound.
+    Any other GeocodeError is not cached.
+    """
+
+    KEY_PREFIX = "geocode:v1:"
+
+    def __init__(self, ttl=86400, negative_ttl=300, max_entries=1024, cache_alias="default"):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "negative_hits": 0, "local_hits": 0}
+
+    def _key(self, norm):
+        return self.KEY_PREFIX + hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value, ttl):
+        with self._lock:
+            self._lru[key] = (time.time() + ttl, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _store(self, key, value, ttl):
+        self._local_set(key, value, ttl)
+        caches[self.cache_alias].set(key, value, ttl)
+
+    def lookup(self, address, fetch):
+        """
+        Return the geocode result for `address`, calling `fetch(address)` on a miss.
+        The returned dict always echoes the caller's own `address` string.
+        """
+        key = self._key(normalise_address(address))
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+        else:
+            value = caches[self.cache_alias].get(key)
+            if value is not None:
+                self._local_set(key, value, self.negative_ttl if value.get("not_found") else self.ttl)
+
+        if value is not None:
+            if value.get("not_found"):
+                self._count("negative_hits")
+                raise AddressNotFound("Address not found.")
+            self._count("hits")
+            return {**value, "address": address}
+
+        self._count("misses")
+        try:
+            result = fetch(address)
+        except AddressNotFound:
+            self._store(key, {"not_found": True}, self.negative_ttl)
+            raise
+        self._store(key, result, self.ttl)
+        return {**result, "address": address}
+
+    async def alookup(self, address, afetch):
+        """`lookup` for async callers: awaits the shared cache and `afetch(address)`."""
+        key = self._key(normalise_address(address))
+        cache = caches[self.cache_alias]
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+        else:
+            value = await cache.aget(key)
+            if value is not None:
+                self._local_set(key, value, self.negative_ttl if value.get("not_found") else self.ttl)
+
+        if value is not None:
+            if value.get("not_found"):
+                self._count("negative_hits")
+                raise AddressNotFound("Address not found.")
+            self._count("hits")
+            return {**value, "address": address}
+
+        self._count("misses")
+        try:
+            result = await afetch(address)
+        except AddressNotFound:
+            self._local_set(key, {"not_found": True}, self.negative_ttl)
+            await cache.aset(key, {"not_found": True}, self.negative_ttl)
+            raise
+        self._local_set(key, result, self.ttl)
+        await cache.aset(key, result, self.ttl)
+        return {**result, "address": address}
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "local_entries": len(self._lru)}
+
+    def clear(self):
+        # Local LRU and counters only; shared entries expire on their own TTL.
+        with self._lock:
+            self._lru.clear()
+            for name in self.counters:
+                self.counters[name] = 0
+
+_default = None
+_default_lock = threading.Lock()
+
+def get_geocode_cache():
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = GeocodeCache(
+                    ttl=getattr(settings, "GEOCODE_CACHE_TTL", 86400),
+                    negative_ttl=getattr(settings, "GEOCODE_NEGATIVE_CACHE_TTL", 300),
+                    max_entries=getattr(settings, "GEOCODE_CACHE_MAX_ENTRIES", 1024),
+                    cache_alias=getattr(settings, "GEOCODE_CACHE_ALIAS", "default"),
+                )
+    return _default
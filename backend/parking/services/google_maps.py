@@ -1,30 +1,162 @@
+import threading
+import weakref
+
 import requests
 from django.conf import settings
 
+from .http import AsyncHttpClient, CircuitBreaker, HttpClient, build_session
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
 class GeocodeError(Exception):
     pass
 
+class AddressNotFound(GeocodeError):
+    pass
+
+class GeocodeUnavailable(GeocodeError):
+    pass
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide pooled/retrying client for the geocoding upstream."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(
+                    session=build_session(
+                        pool_size=getattr(settings, "GEOCODE_HTTP_POOL_SIZE", 10),
+                        retries=getattr(settings, "GEOCODE_HTTP_RETRIES", 2),
+                        backoff=getattr(settings, "GEOCODE_HTTP_BACKOFF", 0.2),
+                    ),
+                    breaker=CircuitBreaker(
+                        failure_threshold=getattr(settings, "GEOCODE_BREAKER_THRESHOLD", 5),
+                        reset_timeout=getattr(settings, "GEOCODE_BREAKER_RESET_SECONDS", 30),
+                    ),
+                    timeout=getattr(settings, "GEOCODE_HTTP_TIMEOUT", 5),
+                )
+    return _client
+
+def set_client(client):
+    """Swap the upstream client (e.g. one with a fake transport mounted) and return the old one."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
+
 def geocode_address(address):
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {"address": address, "key": settings.GOOGLE_MAPS_API_KEY}
+    # Cached entry point used by the views; see services/geocode_cache.py.
+    from .geocode_cache import get_geocode_cache
+    return get_geocode_cache().lookup(address, fetch_geocode)
+
+def geocode_many(addresses, max_workers=None):
+    """
+    Geocode `addresses` concurrently, once per distinct normalised address.
+    Returns {address: origin dict, or the GeocodeError it raised} for every input.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .geocode_cache import normalise_address
+
+    unique = {}
+    for address in addresses:
+        unique.setdefault(normalise_address(address), address)
+    if not unique:
+        return {}
+
+    def one(address):
+        try:
+            return geocode_address(address)
+        except GeocodeError as e:
+            return e
+
+    workers = max_workers or getattr(settings, "GEOCODE_BATCH_CONCURRENCY", 8)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(unique)))) as pool:
+        found = dict(zip(unique, pool.map(one, unique.values())))
+    results = {}
+    for address in addresses:
+        result = found[normalise_address(address)]
+        results[address] = result if isinstance(result, GeocodeError) else {**result, "address": address}
+    return results
+
+def _parse_geocode(data, address):
+    status = data.get("status")
+    if status == "ZERO_RESULTS":
+        raise AddressNotFound("Address not found.")
+    if status != "OK":
+        error_message = data.get("error_message", status)
+        raise GeocodeError(f"Google Maps API error: {error_message}")
+    results = data.get("results")
+    location = results[0]["geometry"]["location"]
+    formatted_address = results[0].get("formatted_address", address)
+    return {
+        "latitude": location["lat"],
+        "longitude": location["lng"],
+        "address": address,
+        "formatted_address": formatted_address,
+    }
+
+def _geocode_request(address):
+    url = getattr(settings, "GOOGLE_GEOCODE_URL", None) or GEOCODE_URL
+    return url, {"address": address, "key": settings.GOOGLE_MAPS_API_KEY}
+
+def fetch_geocode(address):
+    url, params = _geocode_request(address)
     try:
-        resp = requests.get(url, params=params, timeout=5)
+        resp = get_client().get(url, params=params)
         resp.raise_for_status()
-        data = resp.json()
-        status = data.get("status")
-        if status == "ZERO_RESULTS":
-            raise GeocodeError("Address not found.")
-        if status != "OK":
-            error_message = data.get("error_message", status)
-            raise GeocodeError(f"Google Maps API error: {error_message}")
-        results = data.get("results")
-        location = results[0]["geometry"]["location"]
-        formatted_address = results[0].get("formatted_address", address)
-        return {
-            "latitude": location["lat"],
-            "longitude": location["lng"],
-            "address": address,
-            "formatted_address": formatted_address,
-        }
+        return _parse_geocode(resp.json(), address)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code < 500:
+            raise GeocodeError(f"Geocoding request failed: {e}")
+        raise GeocodeUnavailable(f"Geocoding request failed: {e}")
+    except requests.RequestException as e:
+        raise GeocodeUnavailable(f"Geocoding request failed: {e}")
+
+# -------------------- async --------------------
+
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    """
+    Pooled AsyncHttpClient for the running event loop (httpx pools are loop-bound).
+    It shares the sync client's circuit breaker so both paths see the same upstream health.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncHttpClient(
+            breaker=get_client().breaker,
+            timeout=getattr(settings, "GEOCODE_HTTP_TIMEOUT", 5),
+            retries=getattr(settings, "GEOCODE_HTTP_RETRIES", 2),
+            backoff=getattr(settings, "GEOCODE_HTTP_BACKOFF", 0.2),
+            pool_size=getattr(settings, "GEOCODE_HTTP_POOL_SIZE", 10),
+        )
+        _async_clients[loop] = client
+    return client
+
+def set_async_client(client):
+    """Install `client` for the running event loop (e.g. one on an httpx.MockTransport)."""
+    import asyncio
+
+    _async_clients[asyncio.get_running_loop()] = client
+
+async def afetch_geocode(address):
+    url, params = _geocode_request(address)
+    try:
+        resp = await get_async_client().get(url, params=params)
     except requests.RequestException as e:
-        raise GeocodeError(f"Geocoding request failed: {e}")
\ No newline at end of file
+        raise GeocodeUnavailable(f"Geocoding request failed: {e}")
+    if resp.status_code >= 400:
+        raise GeocodeError(f"Geocoding request failed: {resp.status_code} for url: {url}")
+    return _parse_geocode(resp.json(), address)
+
+async def ageocode_address(address):
+    """Async, cached equivalent of `geocode_address`."""
+    from .geocode_cache import get_geocode_cache
+    return await get_geocode_cache().alookup(address, afetch_geocode)
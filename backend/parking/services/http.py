@@ -0,0 +1,165 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    After `failure_threshold` failures in a row the circuit opens and calls fail fast
+    for `reset_timeout` seconds; then a single trial call is let through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+def _retry(retries, backoff):
+    kwargs = dict(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+    )
+    try:
+        return Retry(backoff_jitter=backoff, **kwargs)
+    except TypeError:
+        # urllib3 < 2 has no jitter support; plain exponential backoff.
+        return Retry(**kwargs)
+
+def build_session(pool_size=10, retries=2, backoff=0.2):
+    """requests.Session with a keep-alive connection pool and bounded, jittered retries."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=_retry(retries, backoff))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class HttpClient:
+    """
+    Shared session + circuit breaker for one upstream.
+    `mount(prefix, adapter)` swaps the transport for URLs under `prefix`, e.g. to
+    route calls to an in-process fake in tests.
+    """
+
+    def __init__(self, session=None, breaker=None, timeout=5):
+        self.session = session or build_session()
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = timeout
+
+    def mount(self, prefix, adapter):
+        self.session.mount(prefix, adapter)
+
+    def get(self, url, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {url}")
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            resp = self.session.get(url, **kwargs)
+            if resp.status_code >= 500:
+                resp.raise_for_status()
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return resp
+
+class AsyncHttpClient:
+    """
+    Async counterpart of HttpClient on an httpx.AsyncClient connection pool.
+    Shares the CircuitBreaker semantics and retries transport errors / RETRY_STATUSES
+    with jittered exponential backoff. `transport` may be any httpx transport
+    (e.g. httpx.MockTransport) for tests.
+    """
+
+    def __init__(self, breaker=None, timeout=5, retries=2, backoff=0.2, pool_size=10, transport=None):
+        import httpx
+
+        self._httpx = httpx
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+
+    async def get(self, url, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {url}")
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self.client.get(url, **kwargs)
+                if resp.status_code not in RETRY_STATUSES:
+                    break
+            except self._httpx.TransportError as e:
+                resp, error = None, requests.ConnectionError(str(e))
+            if attempt < self.retries:
+                delay = self.backoff * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+        if resp is not None and resp.status_code not in RETRY_STATUSES and resp.status_code < 500:
+            self.breaker.record_success()
+            return resp
+        if resp is not None:
+            # Retries exhausted, or a 5xx that isn't worth retrying (501, 505, ...).
+            kind = "Server" if resp.status_code >= 500 else "Client"
+            error = requests.HTTPError(f"{resp.status_code} {kind} Error for url: {url}")
+        self.breaker.record_failure()
+        raise error
+
+    async def aclose(self):
+        await self.client.aclose()
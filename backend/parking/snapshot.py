@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+import time
+from functools import cached_property
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+
+from .models import Parking
+from .restrictions import restriction_masks
+from .selectors import parking_rows
+from .spatial import BayGrid
+
+logger = logging.getLogger(__name__)
+
+def _watermark():
+    return Parking.objects.aggregate(Max("last_updated"))["last_updated__max"]
+
+class BaySnapshot:
+    """
+    Immutable columnar copy of the bay view, ordered by kerbside_id.
+    Filterable columns are NumPy arrays aligned with `rows`, the BayRow of each bay
+    (kept for encoding). `restrictions` holds each bay's packed allowed-slot mask (see
+    restrictions.py), so signs are parsed once per snapshot. Grids over the snapshot are
+    built on first use and live as long as it does.
+    """
+
+    def __init__(self, rows, watermark=None):
+        rows = sorted(rows, key=lambda r: r.kerbside_id)
+        self.rows = rows
+        self.watermark = watermark
+        self.loaded_at = time.time()
+        self.size = len(rows)
+        self.kerbside_ids = np.array([r.kerbside_id for r in rows], dtype=str)
+        self.zone_numbers = np.array([r.zone_number or "" for r in rows], dtype=str)
+        self.statuses = np.array([r.status_description or "" for r in rows], dtype=str)
+        self.lats = np.array([np.nan if r.latitude is None else r.latitude for r in rows], dtype=np.float64)
+        self.lngs = np.array([np.nan if r.longitude is None else r.longitude for r in rows], dtype=np.float64)
+        self.restrictions = restriction_masks(rows)
+
+    def mask(self, filters=None):
+        """Boolean mask of the bays matching `parking_list`-style equality filters."""
+        keep = np.ones(self.size, dtype=bool)
+        for field, value in (filters or {}).items():
+            if field == "is_occupied":
+                keep &= self.statuses == ("Present" if value else "Unoccupied")
+            elif field == "kerbside_id":
+                keep &= self.kerbside_ids == str(value)
+            elif field == "zone_number":
+                keep &= self.zone_numbers == str(value)
+            else:
+                raise ValueError(f"Unsupported filter: {field}")
+        return keep
+
+    def page(self, *, filters=None, after=None, limit=500):
+        """
+        One keyset page ordered by kerbside_id, starting after `after`.
+        Returns (rows, has_more) with BayRow rows.
+        """
+        start = 0 if after is None else int(np.searchsorted(self.kerbside_ids, after, side="right"))
+        idx = np.flatnonzero(self.mask(filters)[start:])[:limit + 1] + start
+        rows = [self.rows[i] for i in idx]
+        return rows[:limit], len(rows) > limit
+
+    def _grid(self, keep):
+        idx = np.flatnonzero(keep)
+        return BayGrid(
+            [self.rows[i] for i in idx],
+            cell_meters=getattr(settings, "PARKING_INDEX_CELL_METERS", 200),
+            restrictions=self.restrictions[idx],
+        )
+
+    @cached_property
+    def free_grid(self):
+        return self._grid(self.mask({"is_occupied": False}))
+
+    @cached_property
+    def grid(self):
+        return self._grid(np.ones(self.size, dtype=bool))
+
+class SnapshotStore:
+    """
+    The process's current BaySnapshot. A new one is swapped in with a single attribute
+    assignment, so readers never take a lock or see a half-built snapshot.
+    A daemon thread re-checks the view every PARKING_SNAPSHOT_REFRESH_SECONDS and reloads
+    only when the latest `last_updated` has moved. Readers are served a snapshot confirmed
+    current within PARKING_SNAPSHOT_MAX_AGE_SECONDS and refresh it inline otherwise
+    (refresher disabled, behind, or failing).
+    """
+
+    def __init__(self, load=parking_rows):
+        self._load = load
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._thread = None
+        self._pid = None
+
+    def age(self):
+        """Seconds since the current snapshot was last confirmed up to date."""
+        return time.monotonic() - self._checked_at
+
+    def get(self, max_age=None):
+        if max_age is None:
+            max_age = getattr(settings, "PARKING_SNAPSHOT_MAX_AGE_SECONDS", 60)
+        self._ensure_refresher()
+        snapshot = self._snapshot
+        if snapshot is None or self.age() > max_age:
+            snapshot = self.refresh(max_age)
+        return snapshot
+
+    def refresh(self, max_age=0):
+        with self._lock:
+            if self._snapshot is not None and self.age() <= max_age:
+                return self._snapshot  # refreshed by another thread while we waited
+            watermark = _watermark()
+            if self._snapshot is None or watermark != self._snapshot.watermark:
+                self._snapshot = BaySnapshot(self._load(), watermark)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def _ensure_refresher(self):
+        interval = getattr(settings, "PARKING_SNAPSHOT_REFRESH_SECONDS", 10)
+        # Threads don't survive a fork, so a pre-forked worker starts its own.
+        if not interval or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="bay-snapshot", daemon=True)
+            self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the last snapshot through transient DB errors.
+                logger.exception("Bay snapshot refresh failed")
+            finally:
+                close_old_connections()
+
+_store = SnapshotStore()
+
+def bay_snapshot(max_age=None):
+    """The current BaySnapshot, at most `max_age` (default PARKING_SNAPSHOT_MAX_AGE_SECONDS) seconds stale."""
+    return _store.get(max_age)
+
+def free_bay_index():
+    """Grid over the currently unoccupied bays of the snapshot."""
+    return bay_snapshot().free_grid
+
+def bay_location_index():
+    """Grid over every bay of the snapshot regardless of status."""
+    return bay_snapshot().grid
+
+def bays_within(lat, lng, radius_m):
+    """kerbside_ids of all bays within `radius_m` meters, nearest first."""
+    spots, distance_m, _ = bay_location_index().within(lat, lng, radius_m)
+    return [spots[i].kerbside_id for i in np.argsort(distance_m, kind="stable")]
@@ -0,0 +1,159 @@
+from math import cos, floor, radians
+
+import numpy as np
+
+from .restrictions import allowed_at
+from .utils import WALKING_SPEED_M_PER_S, walk_times_many
+
+METERS_PER_DEGREE = 111320
+# Great-circle meters per degree on the sphere haversine uses (R = 6371 km); a bit
+# shorter than METERS_PER_DEGREE, so lower bounds on distance must use this one.
+_SPHERE_METERS_PER_DEGREE = 6371000 * 3.141592653589793 / 180
+
+class BayGrid:
+    """
+    Uniform grid over bay coordinates.
+    Cells are roughly `cell_meters` square around the reference latitude, so a
+    radius query only has to look at the handful of cells its bounding box touches.
+    Spots are stored sorted by cell with parallel lat/lng arrays, and each cell maps
+    to a contiguous (start, stop) slice of them.
+    """
+
+    def __init__(self, spots, cell_meters=200, restrictions=None):
+        keep = [i for i, s in enumerate(spots) if s.latitude is not None and s.longitude is not None]
+        self.cell_meters = cell_meters
+        ref_lat = sum(spots[i].latitude for i in keep) / len(keep) if keep else 0.0
+        self._lng_scale = METERS_PER_DEGREE * max(cos(radians(ref_lat)), 1e-6)
+        order = sorted(keep, key=lambda i: self._cell(spots[i].latitude, spots[i].longitude))
+        spots = [spots[i] for i in order]
+        self.spots = spots
+        # Packed allowed-slot masks (see restrictions.py) aligned with `spots`, if given.
+        self.restrictions = None if restrictions is None else restrictions[order]
+        self.lats = np.array([s.latitude for s in spots], dtype=np.float64)
+        self.lngs = np.array([s.longitude for s in spots], dtype=np.float64)
+        self.cells = {}
+        for i, spot in enumerate(spots):
+            key = self._cell(spot.latitude, spot.longitude)
+            start, _ = self.cells.get(key, (i, i))
+            self.cells[key] = (start, i + 1)
+        self.size = len(spots)
+        rows = [row for row, _ in self.cells] or [0]
+        cols = [col for _, col in self.cells] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat, lng):
+        return (
+            floor(lat * METERS_PER_DEGREE / self.cell_meters),
+            floor(lng * self._lng_scale / self.cell_meters),
+        )
+
+    def candidates(self, lat, lng, radius_m):
+        """Positions (into `spots`) of every spot in a cell overlapping the radius' bounding box."""
+        dlat = radius_m / METERS_PER_DEGREE
+        # Widest longitude span happens at the box edge closest to a pole.
+        edge_cos = cos(radians(min(abs(lat) + dlat, 89.9)))
+        dlng = radius_m / (METERS_PER_DEGREE * max(edge_cos, 1e-6))
+        lo_row, lo_col = self._cell(lat - dlat, lng - dlng)
+        hi_row, hi_col = self._cell(lat + dlat, lng + dlng)
+        ranges = [
+            np.arange(*self.cells[(row, col)])
+            for row in range(lo_row, hi_row + 1)
+            for col in range(lo_col, hi_col + 1)
+            if (row, col) in self.cells
+        ]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.intp)
+
+    def legal(self, idx, slot):
+        """The positions of `idx` whose spots may be parked in during week slot `slot` (None: all)."""
+        if slot is None or self.restrictions is None or not len(idx):
+            return idx
+        return idx[allowed_at(self.restrictions[idx], slot)]
+
+    def within(self, lat, lng, radius_m, slot=None):
+        """
+        Spots within `radius_m` meters of the point (only those legal in week slot `slot`, if given).
+        Returns (spots, distance_m, walk_minutes) with the two arrays aligned to `spots`.
+        """
+        idx = self.legal(self.candidates(lat, lng, radius_m), slot)
+        distance_m, walk_min = walk_times_many(lat, lng, self.lats[idx], self.lngs[idx])
+        keep = distance_m <= radius_m
+        return [self.spots[i] for i in idx[keep]], distance_m[keep], walk_min[keep]
+
+    def _ring(self, row0, col0, r):
+        if r == 0:
+            return [(row0, col0)] if (row0, col0) in self.cells else []
+        top, bottom = row0 - r, row0 + r
+        ring = [(top, col) for col in range(col0 - r, col0 + r + 1)]
+        ring += [(bottom, col) for col in range(col0 - r, col0 + r + 1)]
+        ring += [(row, col) for row in range(top + 1, bottom) for col in (col0 - r, col0 + r)]
+        return [cell for cell in ring if cell in self.cells]
+
+    def _clearance(self, lat, lng, row0, col0, r):
+        """Lower bound (meters) on the distance from the point to any spot outside rings 0..r."""
+        lat_lo = (row0 - r) * self.cell_meters / METERS_PER_DEGREE
+        lat_hi = (row0 + r + 1) * self.cell_meters / METERS_PER_DEGREE
+        lng_lo = (col0 - r) * self.cell_meters / self._lng_scale
+        lng_hi = (col0 + r + 1) * self.cell_meters / self._lng_scale
+        min_cos = max(min(cos(radians(lat_lo)), cos(radians(lat_hi))), 0.0)
+        meters = min(
+            (lat - lat_lo) * _SPHERE_METERS_PER_DEGREE,
+            (lat_hi - lat) * _SPHERE_METERS_PER_DEGREE,
+            (lng - lng_lo) * _SPHERE_METERS_PER_DEGREE * min_cos,
+            (lng_hi - lng) * _SPHERE_METERS_PER_DEGREE * min_cos,
+        )
+        return 0.999 * meters  # slack for the flat-box vs. great-circle approximation
+
+    def _ring_reach(self, lat, lng, row0, col0, radius_m):
+        """Outermost ring around (row0, col0) holding a cell within `radius_m` meters of the point."""
+        dlat = radius_m / _SPHERE_METERS_PER_DEGREE
+        edge_cos = cos(radians(min(abs(lat) + dlat, 89.9)))
+        dlng = radius_m / (_SPHERE_METERS_PER_DEGREE * max(edge_cos, 1e-6))
+        lo_row, lo_col = self._cell(lat - dlat, lng - dlng)
+        hi_row, hi_col = self._cell(lat + dlat, lng + dlng)
+        return max(row0 - lo_row, hi_row - row0, col0 - lo_col, hi_col - col0)
+
+    def nearest(self, lat, lng, k, max_radius_m=None, slot=None):
+        """
+        The `k` spots closest to the point (optionally only those within `max_radius_m`,
+        and only those legal in week slot `slot`), nearest first. Scans rings of cells
+        outward from the point's cell, keeping only the best `k` so far, and stops as soon
+        as no unscanned cell can hold a closer one.
+        Returns (spots, distance_m, walk_minutes) like `within`.
+        """
+        empty = [], np.empty(0), np.empty(0)
+        if k <= 0 or not self.size:
+            return empty
+        row0, col0 = self._cell(lat, lng)
+        min_row, max_row, min_col, max_col = self._bounds
+        # Rings closer than the grid's bounds are empty; rings past `max_radius_m` can't match.
+        first_ring = max(min_row - row0, row0 - max_row, min_col - col0, col0 - max_col, 0)
+        last_ring = max(row0 - min_row, max_row - row0, col0 - min_col, max_col - col0, 0)
+        if max_radius_m is not None:
+            last_ring = min(last_ring, self._ring_reach(lat, lng, row0, col0, max_radius_m))
+            if first_ring and self._clearance(lat, lng, row0, col0, first_ring - 1) >= max_radius_m:
+                return empty
+
+        best_idx = np.empty(0, dtype=np.intp)
+        best_dist = np.empty(0)
+        for r in range(first_ring, last_ring + 1):
+            cells = self._ring(row0, col0, r)
+            if cells:
+                idx = self.legal(np.concatenate([np.arange(*self.cells[cell]) for cell in cells]), slot)
+                dist, _ = walk_times_many(lat, lng, self.lats[idx], self.lngs[idx])
+                if max_radius_m is not None:
+                    keep = dist <= max_radius_m
+                    idx, dist = idx[keep], dist[keep]
+                best_idx = np.concatenate([best_idx, idx])
+                best_dist = np.concatenate([best_dist, dist])
+                if len(best_idx) > k:
+                    top = np.argpartition(best_dist, k - 1)[:k]
+                    best_idx, best_dist = best_idx[top], best_dist[top]
+            clearance = self._clearance(lat, lng, row0, col0, r)
+            if max_radius_m is not None and clearance >= max_radius_m:
+                break
+            if len(best_idx) == k and best_dist.max() <= clearance:
+                break
+
+        order = np.argsort(best_dist, kind="stable")
+        best_idx, best_dist = best_idx[order], best_dist[order]
+        return [self.spots[i] for i in best_idx], best_dist, best_dist / WALKING_SPEED_M_PER_S / 60
@@ -0,0 +1,133 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Max, Q
+
+from .models import Parking
+from .utils import decode_cursor, encode_cursor
+
+JOURNAL_KEY = "parking-sync:journal"
+LOCK_KEY = "parking-sync:lock"
+
+class StaleWatermark(Exception):
+    """The client's watermark predates what the journal still remembers."""
+
+def _cache():
+    return caches[getattr(settings, "PARKING_SYNC_CACHE_ALIAS", "default")]
+
+def journal_is_shared():
+    """
+    Whether the journal's cache is shared by every worker (Redis, Memcached, database).
+    A watermark's epoch and seq only mean something to the journal that issued it, so with
+    a per-process cache deltas aren't served at all: every `since` gets a full resync.
+    PARKING_SYNC_ALLOW_LOCAL_CACHE vouches for single-process setups like runserver.
+    """
+    if getattr(settings, "PARKING_SYNC_ALLOW_LOCAL_CACHE", False):
+        return True
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+def check_sync_cache(app_configs=None, **kwargs):
+    if journal_is_shared():
+        return []
+    alias = getattr(settings, "PARKING_SYNC_CACHE_ALIAS", "default")
+    return [checks.Warning(
+        f"CACHES[{alias!r}] is {type(_cache()).__name__}, which workers don't share, so "
+        "/parking/changes answers every poll with a full snapshot.",
+        hint="Point PARKING_SYNC_CACHE_ALIAS at a shared cache, or set "
+             "PARKING_SYNC_ALLOW_LOCAL_CACHE = True when running a single process.",
+        id="parking.W001",
+    )]
+
+def _db_watermark():
+    agg = Parking.objects.aggregate(lu=Max("last_updated"), st=Max("status_timestamp"))
+    stamps = [v for v in (agg["lu"], agg["st"]) if v is not None]
+    return max(stamps).isoformat() if stamps else None
+
+def _new_journal():
+    return {"epoch": uuid.uuid4().hex, "seq": 0, "min_seq": 0, "ids": None, "entries": [], "checked_at": 0.0}
+
+def refresh_journal(force=False):
+    """
+    Diff the current bay id set against the last one and append (seq, added, removed)
+    when it changed. Runs at most every PARKING_SYNC_JOURNAL_SECONDS across workers
+    sharing the cache; keeps the newest PARKING_SYNC_JOURNAL_ENTRIES entries.
+    """
+    cache = _cache()
+    journal = cache.get(JOURNAL_KEY) or _new_journal()
+    interval = getattr(settings, "PARKING_SYNC_JOURNAL_SECONDS", 10)
+    if not force and journal["ids"] is not None and time.time() - journal["checked_at"] < interval:
+        return journal
+    if not cache.add(LOCK_KEY, 1, timeout=30):
+        # Another worker is refreshing; its result is at most one interval away.
+        return journal
+    try:
+        journal = cache.get(JOURNAL_KEY) or journal
+        ids = set(Parking.objects.values_list("kerbside_id", flat=True))
+        if journal["ids"] is not None:
+            previous = set(journal["ids"])
+            added, removed = sorted(ids - previous), sorted(previous - ids)
+            if added or removed:
+                journal["seq"] += 1
+                journal["entries"].append([journal["seq"], added, removed])
+                keep = getattr(settings, "PARKING_SYNC_JOURNAL_ENTRIES", 500)
+                if len(journal["entries"]) > keep:
+                    journal["entries"] = journal["entries"][-keep:]
+                    journal["min_seq"] = journal["entries"][0][0] - 1
+        journal["ids"] = sorted(ids)
+        journal["checked_at"] = time.time()
+        cache.set(JOURNAL_KEY, journal, None)
+    finally:
+        cache.delete(LOCK_KEY)
+    return journal
+
+def make_watermark(journal, ts):
+    return encode_cursor(json.dumps({"e": journal["epoch"], "s": journal["seq"], "t": ts}, separators=(",", ":")))
+
+def parse_watermark(token):
+    """(epoch, seq, ts) from a watermark token; ValueError when it isn't one."""
+    try:
+        data = json.loads(decode_cursor(token))
+        return data["e"], int(data["s"]), data["t"]
+    except (KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid watermark: {e}")
+
+def changes_since(token):
+    """
+    Bays changed since `token` plus tombstones for bays that disappeared.
+    Returns (queryset, removed_ids, new_token); raises StaleWatermark when the client
+    has to resync from a full snapshot (`full_snapshot`).
+    """
+    epoch, seq, ts = parse_watermark(token)
+    if not journal_is_shared():
+        raise StaleWatermark()
+    journal = refresh_journal()
+    if epoch != journal["epoch"] or seq < journal["min_seq"] or seq > journal["seq"]:
+        raise StaleWatermark()
+
+    added, removed = set(), set()
+    for entry_seq, entry_added, entry_removed in journal["entries"]:
+        if entry_seq > seq:
+            added.difference_update(entry_removed)
+            removed.difference_update(entry_added)
+            added.update(entry_added)
+            removed.update(entry_removed)
+
+    # Read the DB watermark first: rows updated while we query are re-sent next poll.
+    new_ts = _db_watermark() or ts
+    changed = Q(kerbside_id__in=added)
+    if ts:
+        changed |= Q(last_updated__gt=ts) | Q(status_timestamp__gt=ts)
+    qs = Parking.objects.filter(changed).order_by("kerbside_id")
+    return qs, sorted(removed), make_watermark(journal, new_ts)
+
+def full_snapshot():
+    """Every bay plus a fresh watermark, for first syncs and stale clients."""
+    journal = refresh_journal()
+    ts = _db_watermark()
+    return Parking.objects.order_by("kerbside_id"), make_watermark(journal, ts)
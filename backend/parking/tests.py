@@ -1,3 +1,365 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import threading
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import joblib
+import numpy as np
+import pandas as pd
+import requests
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from . import history_cache, snapshot
+from .models import Parking
+from .prediction.registry import ModelRegistry
+from .prediction.scores import time_slot
+from .prediction.training import prepare_chunk
+from .restrictions import SLOTS_PER_DAY, allowed_at, allowed_slots, parse_days, parse_times, prohibits_parking
+from .selectors import BayRow
+from .services import google_maps
+from .services.http import AsyncHttpClient, CircuitBreaker
+from .sync import StaleWatermark, changes_since, full_snapshot, parse_watermark, refresh_journal
+from .utils import WALKING_SPEED_M_PER_S, decode_cursor, encode_cursor, haversine_many
+
+def _status(code, calls):
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(code)
+    return httpx.MockTransport(handler)
+
+class AsyncHttpClientTests(SimpleTestCase):
+
+    def test_non_retried_5xx_raises_http_error(self):
+        calls, breaker = [], CircuitBreaker(failure_threshold=1)
+        client = AsyncHttpClient(breaker=breaker, backoff=0, transport=_status(501, calls))
+        with self.assertRaisesMessage(requests.HTTPError, "501 Server Error"):
+            asyncio.run(client.get("https://upstream.test/geocode"))
+        self.assertEqual(len(calls), 1)  # 501 isn't retried
+        self.assertEqual(breaker.state, "open")
+
+    def test_half_open_trial_failing_with_501_reopens_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        client = AsyncHttpClient(breaker=breaker, backoff=0, transport=_status(501, []))
+        with self.assertRaises(requests.HTTPError):
+            asyncio.run(client.get("https://upstream.test/geocode"))
+        self.assertFalse(breaker._trial_in_flight)
+        self.assertTrue(breaker.allow())  # the next trial isn't blocked by a stuck flag
+
+    def test_afetch_geocode_reports_501_as_unavailable(self):
+        async def fetch():
+            google_maps.set_async_client(AsyncHttpClient(breaker=CircuitBreaker(), backoff=0, transport=_status(501, [])))
+            return await google_maps.afetch_geocode("1 Swanston St")
+
+        with self.settings(GOOGLE_MAPS_API_KEY="test"), self.assertRaises(google_maps.GeocodeUnavailable):
+            asyncio.run(fetch())
+
+class TimeSlotTests(SimpleTestCase):
+
+    def test_aware_times_are_read_on_the_local_clock(self):
+        # 00:44 UTC on a Tuesday is 11:44 in Melbourne (AEDT, +11:00).
+        for dt in ("2025-03-25T11:44+11:00", "2025-03-25T00:44:00Z", "2025-03-25T11:44"):
+            self.assertEqual(time_slot(dt), (1, 11))
+        self.assertEqual(time_slot("2025-03-24T23:30:00+00:00"), (1, 10))
+
+    def test_training_rows_match_serving_slots(self):
+        stamps = ["2025-03-25T00:44:37+00:00", "2025-03-25T00:44:37Z", "2025-03-25T11:44:37+11:00",
+                  "2025-03-25T11:44:37", "2025-03-29T14:05:00Z", "2025-06-01T23:59:00+10:00"]
+        chunk = prepare_chunk(pd.DataFrame({
+            "zone_number": ["7303"] * len(stamps),
+            "kerbsideid": ["1"] * len(stamps),
+            "status_timestamp": stamps,
+            "status_description": ["Unoccupied"] * len(stamps),
+        }))
+        self.assertEqual(list(zip(chunk["dow"], chunk["hour"])), [time_slot(s) for s in stamps])
+        self.assertEqual(time_slot(stamps[0]), (1, 11))
+
+class RestrictionParsingTests(SimpleTestCase):
+
+    def test_parse_days(self):
+        self.assertEqual(parse_days("Mon-Fri"), {0, 1, 2, 3, 4})
+        self.assertEqual(parse_days("Monday to Friday"), {0, 1, 2, 3, 4})
+        self.assertEqual(parse_days("Mon - Fri"), {0, 1, 2, 3, 4})
+        self.assertEqual(parse_days("M-SAT"), {0, 1, 2, 3, 4, 5})
+        self.assertEqual(parse_days("Sat-Sun"), {5, 6})
+        self.assertEqual(parse_days("Fri-Mon"), {4, 5, 6, 0})
+        self.assertEqual(parse_days("Mon,Wed"), {0, 2})
+        self.assertIsNone(parse_days("2P"))
+        self.assertIsNone(parse_days(None))
+
+    def test_parse_times(self):
+        self.assertEqual(parse_times("7:30AM-6:30PM"), (450, 1110))
+        self.assertEqual(parse_times("LZ 30M 7:30am to 6:30pm"), (450, 1110))
+        self.assertEqual(parse_times("NS 12AM-12PM"), (0, 720))
+        self.assertIsNone(parse_times("2P MTR"))
+
+    def test_prohibits_parking(self):
+        for sign in ("LZ 30M", "NO STOPPING", "DP2P", "PP", "PP 2P", "HP", "SP", "BUS ZONE", "PERMIT ZONE"):
+            self.assertTrue(prohibits_parking(sign), sign)
+        for sign in ("2P", "1P MTR", "MP2P", "FP1P", "QP", "2P BUSINESS DISTRICT", "", None):
+            self.assertFalse(prohibits_parking(sign), sign)
+
+    def test_allowed_at(self):
+        masks = np.packbits(np.stack([
+            allowed_slots("2P", None, None, None),
+            allowed_slots("LZ 30M", "Mon-Fri", time(7, 30), time(18, 30)),
+            allowed_slots("NS", "Sat", time(22, 0), time(2, 0)),
+        ]), axis=1)
+        tuesday = SLOTS_PER_DAY
+        self.assertEqual(allowed_at(masks, tuesday + 7 * 4).tolist(), [True, True, True])
+        self.assertEqual(allowed_at(masks, tuesday + 7 * 4 + 2).tolist(), [True, False, True])
+        self.assertEqual(allowed_at(masks, tuesday + 18 * 4 + 2).tolist(), [True, True, True])
+        # Saturday's 22:00-02:00 window runs into Sunday morning.
+        self.assertEqual(allowed_at(masks, 5 * SLOTS_PER_DAY + 23 * 4).tolist(), [True, True, False])
+        self.assertEqual(allowed_at(masks, 6 * SLOTS_PER_DAY + 1 * 4).tolist(), [True, True, False])
+        self.assertEqual(allowed_at(masks, 6 * SLOTS_PER_DAY + 2 * 4).tolist(), [True, True, True])
+
+@mock.patch("parking.rollups.get_watermark", return_value=datetime(2025, 3, 25, 10, 5))
+class HistoryCacheTests(SimpleTestCase):
+    query = {"scope": "segment", "id": "22183", "radiusMeters": 300}
+
+    def test_key_ignores_point_fields_for_scoped_queries(self, _watermark):
+        key = history_cache.cache_key("hourly", self.query, "2025-03-01 00:00:00", "2025-03-25 11:00:00")
+        moved = {**self.query, "lat": -37.8, "lng": 144.9, "radiusMeters": 50}
+        self.assertEqual(history_cache.cache_key("hourly", moved, "2025-03-01 00:00:00", "2025-03-25 11:00:00"), key)
+
+    def test_key_changes_when_the_rollup_watermark_advances(self, watermark):
+        window = ("2025-03-01 00:00:00", "2025-03-25 11:00:00")
+        before = history_cache.cache_key("hourly", self.query, *window)
+        self.assertEqual(history_cache.cache_key("hourly", self.query, *window), before)
+        watermark.return_value = datetime(2025, 3, 25, 10, 10)
+        self.assertNotEqual(history_cache.cache_key("hourly", self.query, *window), before)
+
+    def test_respond_caches_only_successful_answers(self, _watermark):
+        key = history_cache.cache_key("hourly", self.query, "2025-01-01 00:00:00", "2025-01-02 00:00:00")
+        calls = []
+
+        def compute(status=200):
+            calls.append(status)
+            return Response({"items": []}, status=status)
+
+        self.assertEqual(history_cache.respond(key + ":err", "2025-01-02 00:00:00", lambda: compute(400)).status_code, 400)
+        self.assertEqual(history_cache.respond(key + ":err", "2025-01-02 00:00:00", lambda: compute(400)).status_code, 400)
+        self.assertEqual(history_cache.respond(key, "2025-01-02 00:00:00", compute)["X-Cache"], "miss")
+        hit = history_cache.respond(key, "2025-01-02 00:00:00", compute)
+        self.assertEqual((hit["X-Cache"], hit.data["cache"]), ("hit", "hit"))
+        self.assertEqual(calls, [400, 400, 200])
+
+def _bays(n, seed=0):
+    rng = np.random.default_rng(seed)
+    signs = ["2P", "LZ 30M", "PP", "1P MTR", None]
+    return [
+        BayRow(
+            kerbside_id=str(10000 + i), zone_number=str(7000 + i % 40),
+            status_description="Present" if rng.random() < 0.4 else "Unoccupied",
+            status_timestamp=None, latitude=-37.81 + rng.normal() * 0.01, longitude=144.96 + rng.normal() * 0.01,
+            last_updated=None, sign_text=signs[i % len(signs)], days_of_week="Mon-Fri",
+            start_time=time(7, 30), end_time=time(18, 30),
+        )
+        for i in range(n)
+    ]
+
+class BayGridTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.snap = snapshot.BaySnapshot(_bays(3000))
+        cls.lats = cls.snap.lats
+        cls.lngs = cls.snap.lngs
+        cls.rng = np.random.default_rng(7)
+
+    def _brute(self, lat, lng, radius_m, slot=None):
+        distance_m = haversine_many(lat, lng, self.lats, self.lngs)
+        keep = distance_m <= radius_m
+        if slot is not None:
+            keep &= allowed_at(self.snap.restrictions, slot)
+        return {self.snap.rows[i].kerbside_id: distance_m[i] for i in np.flatnonzero(keep)}
+
+    def test_within_matches_brute_force(self):
+        grid = self.snap.grid
+        for _ in range(100):
+            lat, lng = -37.81 + self.rng.normal() * 0.02, 144.96 + self.rng.normal() * 0.02
+            radius_m = self.rng.uniform(20, 3000)
+            slot = None if self.rng.random() < 0.5 else int(self.rng.integers(0, 7 * SLOTS_PER_DAY))
+            spots, distance_m, walk_min = grid.within(lat, lng, radius_m, slot)
+            expected = self._brute(lat, lng, radius_m, slot)
+            self.assertEqual(sorted(s.kerbside_id for s in spots), sorted(expected))
+            for spot, d, w in zip(spots, distance_m, walk_min):
+                self.assertAlmostEqual(d, expected[spot.kerbside_id], places=6)
+                self.assertAlmostEqual(w, d / WALKING_SPEED_M_PER_S / 60)
+
+    def test_nearest_matches_brute_force(self):
+        grid = self.snap.grid
+        for _ in range(100):
+            lat, lng = -37.81 + self.rng.normal() * 0.03, 144.96 + self.rng.normal() * 0.03
+            k = int(self.rng.integers(1, 40))
+            radius_m = None if self.rng.random() < 0.3 else self.rng.uniform(50, 5000)
+            slot = None if self.rng.random() < 0.5 else int(self.rng.integers(0, 7 * SLOTS_PER_DAY))
+            _, distance_m, _ = grid.nearest(lat, lng, k, radius_m, slot)
+            expected = sorted(self._brute(lat, lng, np.inf if radius_m is None else radius_m, slot).values())[:k]
+            np.testing.assert_allclose(distance_m, expected)
+
+    def test_nearest_far_from_every_bay(self):
+        grid = self.snap.grid
+        spots, _, _ = grid.nearest(-39.6, 144.96, 5, max_radius_m=5000)
+        self.assertEqual(spots, [])
+        spots, distance_m, _ = grid.nearest(-39.6, 144.96, 5)
+        self.assertEqual(len(spots), 5)
+        self.assertGreater(distance_m.min(), 190_000)
+
+    def test_free_grid_holds_only_unoccupied_bays(self):
+        self.assertTrue(all(not s.is_occupied for s in self.snap.free_grid.spots))
+        self.assertEqual(self.snap.free_grid.size, int((self.snap.statuses != "Present").sum()))
+
+class KeysetCursorTests(SimpleTestCase):
+
+    def test_cursor_round_trip(self):
+        for value in ("10042", "ünïcode/+=", ""):
+            self.assertEqual(decode_cursor(encode_cursor(value)), value)
+        with self.assertRaises(ValueError):
+            decode_cursor("not base64!")
+
+    def test_pages_cover_every_match_once_in_order(self):
+        snap = snapshot.BaySnapshot(_bays(257))
+        for filters in (None, {"is_occupied": False}, {"zone_number": "7003"}):
+            seen, after = [], None
+            while True:
+                rows, has_more = snap.page(filters=filters, after=after, limit=25)
+                seen += [r.kerbside_id for r in rows]
+                if not has_more:
+                    break
+                after = decode_cursor(encode_cursor(rows[-1].kerbside_id))
+            expected = sorted(r.kerbside_id for r in snap.rows if all(
+                (r.is_occupied if k == "is_occupied" else getattr(r, k)) == v for k, v in (filters or {}).items()
+            ))
+            self.assertEqual(seen, expected)
+
+def _parking(kerbside_id, when, status="Unoccupied"):
+    return Parking.objects.create(
+        kerbside_id=kerbside_id, zone_number="7303", status_description=status, status_timestamp=when,
+        latitude=-37.81, longitude=144.96, last_updated=when,
+    )
+
+class BayViewTestCase(TestCase):
+    """The bay list is a database view the migrations don't create; stand a table in for it."""
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Parking)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(Parking)
+
+@override_settings(
+    PARKING_SYNC_ALLOW_LOCAL_CACHE=True, PARKING_SYNC_JOURNAL_SECONDS=0, PARKING_SYNC_JOURNAL_ENTRIES=2,
+    PARKING_SNAPSHOT_REFRESH_SECONDS=0, PARKING_SNAPSHOT_MAX_AGE_SECONDS=0,
+)
+class SyncJournalTests(BayViewTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.t0 = datetime(2025, 3, 25, tzinfo=dt_timezone.utc)
+        for i in range(5):
+            _parking(str(100 + i), self.t0)
+
+    def test_changes_since_reports_updates_and_removals(self):
+        _, watermark = full_snapshot()
+        Parking.objects.filter(kerbside_id="101").update(status_description="Present", last_updated=self.t0 + timedelta(minutes=1))
+        Parking.objects.filter(kerbside_id="102").delete()
+        _parking("105", self.t0)
+        changed, removed, watermark = changes_since(watermark)
+        self.assertEqual([p.kerbside_id for p in changed], ["101", "105"])
+        self.assertEqual(removed, ["102"])
+        changed, removed, _ = changes_since(watermark)
+        self.assertEqual((list(changed), removed), ([], []))
+
+    def test_watermark_expires_once_the_journal_drops_its_entries(self):
+        _, old = full_snapshot()
+        for kerbside_id in ("100", "101", "102"):
+            Parking.objects.filter(kerbside_id=kerbside_id).delete()
+            refresh_journal(force=True)
+        self.assertEqual(refresh_journal()["min_seq"], 1)
+        with self.assertRaises(StaleWatermark):
+            changes_since(old)
+        response = APIClient().get("/parking/changes", {"since": old}).json()
+        self.assertTrue(response["full"])
+        self.assertEqual([b["kerbside_id"] for b in response["changes"]], ["103", "104"])
+        _, removed, _ = changes_since(response["watermark"])
+        self.assertEqual(removed, [])
+
+    def test_watermarks_from_another_journal_or_garbage(self):
+        epoch, seq, ts = parse_watermark(full_snapshot()[1])
+        cache.clear()
+        with self.assertRaises(StaleWatermark):
+            changes_since(encode_cursor(f'{{"e":"{epoch}","s":{seq},"t":null}}'))
+        with self.assertRaises(ValueError):
+            parse_watermark(encode_cursor("{}"))
+        self.assertEqual(APIClient().get("/parking/changes", {"since": "garbage"}).status_code, 400)
+
+    @override_settings(PARKING_SYNC_ALLOW_LOCAL_CACHE=False)
+    def test_local_cache_always_resyncs(self):
+        _, watermark = full_snapshot()
+        with self.assertRaises(StaleWatermark):
+            changes_since(watermark)
+
+    def test_list_pages_through_the_snapshot(self):
+        with mock.patch.object(snapshot, "_store", snapshot.SnapshotStore()):
+            client, seen, cursor = APIClient(), [], None
+            while True:
+                page = client.get("/parking/", {"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+                seen += [b["kerbside_id"] for b in page["results"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            self.assertEqual(seen, ["100", "101", "102", "103", "104"])
+            self.assertEqual(client.get("/parking/", {"cursor": "%%%"}).status_code, 400)
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".joblib")
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+        joblib.dump({"version": 1}, self.path)
+
+    def test_reloads_only_when_the_content_changes(self):
+        registry = ModelRegistry(self.path, check_interval=0)
+        first = registry.get()
+        self.assertEqual(first.model, {"version": 1})
+        os.utime(self.path)
+        self.assertIs(registry.get(), first)  # same bytes, new mtime
+        joblib.dump({"version": 2}, self.path)
+        self.assertEqual(registry.get().model, {"version": 2})
+
+    def test_keeps_the_last_good_model(self):
+        registry = ModelRegistry(self.path, check_interval=0)
+        first = registry.get()
+        with open(self.path, "wb") as f:
+            f.write(b"partial")
+        self.assertIs(registry.get(), first)
+        os.unlink(self.path)
+        self.assertIs(registry.get(), first)
+        joblib.dump({"version": 1}, self.path)  # for cleanup
+
+    def test_readers_are_not_blocked_by_a_reload(self):
+        registry = ModelRegistry(self.path, check_interval=0)
+        first = registry.get()
+        got = []
+        with registry._lock:  # another thread is mid-reload
+            reader = threading.Thread(target=lambda: got.append(registry.get()))
+            reader.start()
+            reader.join(timeout=5)
+        self.assertEqual(got, [first])
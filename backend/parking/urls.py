@@ -1,12 +1,19 @@
 from django.urls import path
 from . import views
 from .views_history import ParkingHistoryApi, ParkingHistorySummaryApi
+from .views_async import parking_nearby_async, parking_nearby_predict_async
+from .views_live import parking_live_stream
 
 
 urlpatterns = [
     path('', views.ParkingListApi.as_view(), name='parking-list'),
+    path('changes', views.ParkingChangesApi.as_view(), name='parking-changes'),
+    path('live', parking_live_stream, name='parking-live'),
     path('nearby', views.ParkingNearbyApi.as_view(), name='parking-nearby'),
+    path('nearby/batch', views.ParkingNearbyBatchApi.as_view(), name='parking-nearby-batch'),
     path('nearby/predict', views.ParkingNearbyPredictApi.as_view(), name='parking-nearby-predict'),
+    path('nearby/async', parking_nearby_async, name='parking-nearby-async'),
+    path('nearby/predict/async', parking_nearby_predict_async, name='parking-nearby-predict-async'),
     path('history', ParkingHistoryApi.as_view(), name='parking-history'),
     path('history/summary', ParkingHistorySummaryApi.as_view(), name='parking-history-summary'),
 ]
\ No newline at end of file
@@ -1,28 +1,56 @@
-from math import radians, cos, sin, asin, sqrt
-import uuid
-from rest_framework import serializers
-import ulid
+import base64
+import binascii
+from functools import wraps
+import numpy as np
+from django.db import close_old_connections
 
 WALKING_SPEED_M_PER_S = 1.388
 
-def haversine(lat1, lng1, lat2, lng2):
-    """Calculate the great-circle distance between two points on the Earth in meters."""
+def haversine_many(lat, lng, lats, lngs):
+    """Vectorised haversine: meters from one origin to each of `lats`/`lngs` (array-likes)."""
     R = 6371000
-    dlat = radians(lat2 - lat1)
-    dlng = radians(lng2 - lng1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlng/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c
+    lat_r = np.radians(float(lat))
+    lats_r = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lats_r - lat_r
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - float(lng))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat_r) * np.cos(lats_r) * np.sin(dlng / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
 
-def calculate_walk_time(from_lat, from_lng, to_lat, to_lng):
-    distance_m = haversine(float(from_lat), float(from_lng), float(to_lat), float(to_lng))
-    return distance_m / WALKING_SPEED_M_PER_S / 60
+def haversine_matrix(lats_a, lngs_a, lats_b, lngs_b):
+    """Meters between every pair of points: shape (len(lats_a), len(lats_b))."""
+    R = 6371000
+    la = np.radians(np.asarray(lats_a, dtype=np.float64))[:, None]
+    lb = np.radians(np.asarray(lats_b, dtype=np.float64))[None, :]
+    dlng = np.radians(np.asarray(lngs_b, dtype=np.float64)[None, :] - np.asarray(lngs_a, dtype=np.float64)[:, None])
+    a = np.sin((lb - la) / 2) ** 2 + np.cos(la) * np.cos(lb) * np.sin(dlng / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def walk_times_many(from_lat, from_lng, lats, lngs):
+    """Return (distance_m, walk_minutes) arrays in one pass, see `haversine_many`."""
+    distance_m = haversine_many(from_lat, from_lng, lats, lngs)
+    return distance_m, distance_m / WALKING_SPEED_M_PER_S / 60
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(str(value).encode("utf-8")).decode("ascii").rstrip("=")
 
-def create_serializer_class(name, fields):
-    return type(name, (serializers.Serializer,), fields)
+def decode_cursor(token):
+    """Inverse of `encode_cursor`; raises ValueError for a malformed token."""
+    try:
+        return base64.b64decode(token + "=" * (-len(token) % 4), altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
 
-def inline_serializer(*, fields, data=None, **kwargs):
-    serializer_class = create_serializer_class(name=str(ulid.new()),fields=fields)
-    if data is not None:
-        return serializer_class(data=data, **kwargs)
-    return serializer_class(**kwargs)
\ No newline at end of file
+def fresh_db_connection(fn):
+    """
+    For ORM work on threads Django's request cycle doesn't manage (sync_to_async with
+    thread_sensitive=False, background pollers): drop broken or expired connections
+    before and after the call, as request_started/request_finished do.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
@@ -1,41 +1,249 @@
-import os
-
 from rest_framework.views import APIView
 from rest_framework import serializers, status
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from django.conf import settings
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from .prediction.main import ParkingPredictor
-from .selectors import parking_list
-from .services.google_maps import GeocodeError, geocode_address 
-from .utils import calculate_walk_time, haversine 
-from .serializers import ( ParkingSerializer,ParkingNearbySerializer )
+import numpy as np
+from .prediction.registry import get_predictor
+from .prediction.scores import get_score_table
+from .services.google_maps import GeocodeError, GeocodeUnavailable, geocode_address, geocode_many
+from .snapshot import bay_snapshot, free_bay_index
+from .spatial import METERS_PER_DEGREE
+from .sync import StaleWatermark, changes_since, full_snapshot
+from .utils import WALKING_SPEED_M_PER_S, decode_cursor, encode_cursor, haversine_matrix
+from .renderers import FastJSONRenderer
+from .restrictions import allowed_at, week_slot
+from .serializers import ( OriginSerializer,ParkingSerializer,ParkingNearbySerializer,ParkingNearbyBatchSerializer,ParkingPageSerializer,ParkingChangesSerializer,encode_nearby_spots )
+
+def _usable(spot):
+    return spot.zone_number is not None and spot.kerbside_id is not None
+
+def nearby_spot_data(grid, lat, lng, max_walk_time, limit=None, sort=None, slot=None):
+    """
+    Encoded bays of `grid` within `max_walk_time` minutes' walk, with walk_time/distance_km.
+    With `limit`, only the `limit` closest (nearest first, found without scanning the
+    whole radius); with sort="distance", all of them nearest first. With a week `slot`
+    (see restriction_slot), bays whose signs forbid parking then are left out.
+    """
+    radius_m = max_walk_time * 60 * WALKING_SPEED_M_PER_S
+    if limit is None:
+        spots, distance_m, walk_min = grid.within(lat, lng, radius_m, slot)
+        if sort == "distance":
+            order = np.argsort(distance_m, kind="stable")
+            spots, distance_m, walk_min = [spots[i] for i in order], distance_m[order], walk_min[order]
+    else:
+        k = limit
+        while True:
+            spots, distance_m, walk_min = grid.nearest(lat, lng, k, radius_m, slot)
+            usable = sum(1 for spot in spots if _usable(spot))
+            if usable >= limit or len(spots) < k:
+                break
+            k += limit - usable
+    keep = [i for i, spot in enumerate(spots) if _usable(spot)][:limit]
+    return encode_nearby_spots([spots[i] for i in keep], distance_m[keep].tolist(), walk_min[keep].tolist())
+
+# Upper bound on origins × bays distances held in memory at once by the batch search.
+MATRIX_BLOCK = 1_000_000
+# The shared matrix only pays off while each origin reaches a fair share of the bays
+# inside the origins' joint bounding box; past this area ratio the grid search wins.
+MATRIX_MAX_SPREAD = 4
+
+def batch_nearby_spot_data(grid, origins):
+    """
+    `nearby_spot_data` for many (lat, lng, max_walk_time, limit, sort, slot) origins at once:
+    one vectorised origins × bays distance matrix (in blocks of MATRIX_BLOCK cells)
+    over only the bays inside the origins' bounding box. Origins spread far apart are
+    searched one by one on the grid instead. Returns one spot list per origin.
+    """
+    out = [[] for _ in origins]
+    if not origins or not grid.size:
+        return out
+    lats = np.array([o[0] for o in origins], dtype=np.float64)
+    lngs = np.array([o[1] for o in origins], dtype=np.float64)
+    radius = np.array([o[2] for o in origins], dtype=np.float64) * 60 * WALKING_SPEED_M_PER_S
+    dlat = radius / METERS_PER_DEGREE
+    edge_cos = np.maximum(np.cos(np.radians(np.minimum(np.abs(lats) + dlat, 89.9))), 1e-6)
+    dlng = radius / (METERS_PER_DEGREE * edge_cos)
+    south, north = (lats - dlat).min(), (lats + dlat).max()
+    west, east = (lngs - dlng).min(), (lngs + dlng).max()
+    if (north - south) * (east - west) > MATRIX_MAX_SPREAD * np.mean(4 * dlat * dlng):
+        return [nearby_spot_data(grid, *origin) for origin in origins]
+    cols = np.flatnonzero(
+        (grid.lats >= south) & (grid.lats <= north) & (grid.lngs >= west) & (grid.lngs <= east)
+    )
+    if not len(cols):
+        return out
+
+    legal = {}  # week slot -> which of `cols` may be parked in then
+    block = max(1, MATRIX_BLOCK // len(cols))
+    for start in range(0, len(origins), block):
+        stop = min(start + block, len(origins))
+        distances = haversine_matrix(lats[start:stop], lngs[start:stop], grid.lats[cols], grid.lngs[cols])
+        for row, distance_m in enumerate(distances, start):
+            _, _, _, limit, sort, slot = origins[row]
+            within = distance_m <= radius[row]
+            if slot is not None and grid.restrictions is not None:
+                if slot not in legal:
+                    legal[slot] = allowed_at(grid.restrictions[cols], slot)
+                within &= legal[slot]
+            hit = np.flatnonzero(within)
+            if limit is not None or sort == "distance":
+                hit = hit[np.argsort(distance_m[hit], kind="stable")]
+            spots, distance = [], []
+            for i, d in zip(cols[hit].tolist(), distance_m[hit].tolist()):
+                if limit is not None and len(spots) == limit:
+                    break
+                if _usable(grid.spots[i]):
+                    spots.append(grid.spots[i])
+                    distance.append(d)
+            out[row] = encode_nearby_spots(spots, distance, [d / WALKING_SPEED_M_PER_S / 60 for d in distance])
+    return out
+
+# Longest walk a nearby search accepts; it also bounds how far the grid search reaches.
+MAX_WALK_TIME = 60
+
+class NearbyOptionsSerializer(serializers.Serializer):
+    max_walk_time = serializers.IntegerField(
+        required=False, default=5, min_value=1, max_value=MAX_WALK_TIME,
+        help_text="Walking time from the origin in minutes.",
+    )
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=1000,
+        help_text="Return only the N closest bays, nearest first.",
+    )
+    sort = serializers.ChoiceField(
+        choices=["distance"], required=False,
+        help_text="'distance' returns the bays nearest first.",
+    )
+    include_restricted = serializers.BooleanField(
+        required=False, default=False,
+        help_text="Also return free bays whose signs forbid parking at the requested time.",
+    )
+
+def restriction_slot(options, dt=None):
+    """Week slot to filter restricted bays at (`dt`, default now), or None when the caller opted out."""
+    return None if options.get("include_restricted") else week_slot(dt)
+
+def add_predictions(nearby_spots, dt):
+    """
+    Fill predicted_available_probability from the precomputed score table
+    (manage.py score_bays); bays it doesn't cover are scored with one batched model call.
+    """
+    if not nearby_spots:
+        return
+    zone_numbers = np.array([int(float(s["zone_number"])) for s in nearby_spots], dtype=np.int64)
+    kerbside_ids = np.array([int(float(s["kerbside_id"])) for s in nearby_spots], dtype=np.int64)
+    probs = get_score_table().lookup(kerbside_ids, zone_numbers, dt)
+    missing = np.isnan(probs)
+    if missing.any():
+        probs[missing] = get_predictor().predict_proba_many(zone_numbers[missing], kerbside_ids[missing], dt)[:, 1]
+    for spot_data, prob in zip(nearby_spots, probs.tolist()):
+        spot_data["predicted_available_probability"] = prob
 
 class ParkingListApi(APIView):
-    
+
+    FIELDS = tuple(ParkingSerializer().fields)
+
+    class ParkingListQuerySerializer(serializers.Serializer):
+        cursor = serializers.CharField(required=False)
+        limit = serializers.IntegerField(required=False, default=500, min_value=1, max_value=5000)
+        fields = serializers.CharField(required=False)
+        compact = serializers.BooleanField(required=False, default=False)
+
     @extend_schema(
-        responses=ParkingSerializer(many=True),
+        responses=ParkingPageSerializer,
         parameters=[
             OpenApiParameter(name='kerbside_id', type=str, location=OpenApiParameter.QUERY, required=False, description='Filter by kerbside ID'),
             OpenApiParameter(name='zone_number', type=str, location=OpenApiParameter.QUERY, required=False, description='Filter by zone number'),
             OpenApiParameter(name='is_occupied', type=bool, location=OpenApiParameter.QUERY, required=False, description='Filter by occupancy'),
+            OpenApiParameter(name='cursor', type=str, location=OpenApiParameter.QUERY, required=False, description='next_cursor from the previous page'),
+            OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, required=False, description='Page size (default 500, max 5000)'),
+            OpenApiParameter(name='fields', type=str, location=OpenApiParameter.QUERY, required=False, description='Comma-separated subset of fields, e.g. kerbside_id,is_occupied,latitude,longitude'),
+            OpenApiParameter(name='compact', type=bool, location=OpenApiParameter.QUERY, required=False, description='Return raw column values without DRF serialization'),
         ],
-        description="List parking spot occupancy with optional filters."
+        description="List parking spot occupancy with optional filters, keyset-paginated on kerbside_id."
     )
     def get(self, request):
+        query = self.ParkingListQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
         filters = {
             field: (value.lower() == "true" if field == "is_occupied" else value)
             for field in ["kerbside_id", "zone_number", "is_occupied"]
             if (value := request.query_params.get(field)) is not None
         }
-        spots = parking_list(filters=filters)
-        serializer = self.ParkingSerializer(spots, many=True)
-        return Response(serializer.data)
+
+        fields = self.FIELDS
+        if params.get("fields"):
+            fields = tuple(f for f in (x.strip() for x in params["fields"].split(",")) if f)
+            unknown = sorted(set(fields) - set(self.FIELDS))
+            if unknown:
+                return Response({"error": f"Unknown fields: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        after = None
+        if params.get("cursor"):
+            try:
+                after = decode_cursor(params["cursor"])
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Served from the shared snapshot (at most PARKING_SNAPSHOT_MAX_AGE_SECONDS stale)
+        # rather than a query per page.
+        spots, has_more = bay_snapshot().page(filters=filters, after=after, limit=params["limit"])
+        if params["compact"]:
+            results = [
+                {f: spot.is_occupied if f == "is_occupied" else getattr(spot, f) for f in fields}
+                for spot in spots
+            ]
+        else:
+            results = ParkingSerializer(spots, many=True, fields=fields).data
+        last = spots[-1].kerbside_id if spots else None
+
+        return Response({
+            "results": results,
+            "next_cursor": encode_cursor(last) if has_more and last is not None else None,
+        })
+
+class ParkingChangesApi(APIView):
+
+    @extend_schema(
+        responses=ParkingChangesSerializer,
+        parameters=[
+            OpenApiParameter(name='since', type=str, location=OpenApiParameter.QUERY, required=False, description='watermark from the previous response; omit for a full snapshot'),
+        ],
+        description="Bays changed since a watermark, tombstones for removed bays and a new watermark. "
+                    "Falls back to a full snapshot (full=true) when the watermark is missing or too old."
+    )
+    def get(self, request):
+        since = request.query_params.get("since")
+        full = True
+        removed = []
+        if since:
+            try:
+                spots, removed, watermark = changes_since(since)
+                full = False
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except StaleWatermark:
+                pass
+        if full:
+            spots, watermark = full_snapshot()
+
+        return Response({
+            "full": full,
+            "changes": ParkingSerializer(spots, many=True).data,
+            "removed": removed,
+            "watermark": watermark,
+        })
 
 class ParkingNearbyApi(APIView):
-    
-    class ParkingNearbyInputSerializer(serializers.Serializer):
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    class ParkingNearbyInputSerializer(NearbyOptionsSerializer):
         address = serializers.CharField()
-        max_walk_time = serializers.IntegerField(required=False, default=5)
 
     @extend_schema(
         request=ParkingNearbyInputSerializer,
@@ -51,33 +259,28 @@ class ParkingNearbyApi(APIView):
         
         try:
             origin_data = geocode_address(address)
+        except GeocodeUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except GeocodeError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         lat, lng = origin_data["latitude"], origin_data["longitude"]
         
-        nearby_spots = []
-        for spot in parking_list(filters={"is_occupied": False}):
-            walk_time = calculate_walk_time(lat, lng, spot.latitude, spot.longitude)
-            if (
-                walk_time <= max_walk_time
-                and spot.zone_number is not None
-                and spot.kerbside_id is not None
-            ):
-                spot_data = ParkingSerializer(spot).data
-                spot_data["walk_time"] = walk_time
-                spot_data["distance_km"] = haversine(lat, lng, spot.latitude, spot.longitude) / 1000
-                spot_data["predicted_available_probability"] = None 
-                nearby_spots.append(spot_data)
+        nearby_spots = nearby_spot_data(
+            free_bay_index(), lat, lng, max_walk_time,
+            input_data.validated_data.get("limit"), input_data.validated_data.get("sort"),
+            restriction_slot(input_data.validated_data),
+        )
         
-        serializer = ParkingNearbySerializer({"origin": origin_data, "nearby": nearby_spots})
-        return Response(serializer.data)
+        # Spots are already encoded; ParkingNearbySerializer only documents the shape.
+        return Response({"origin": OriginSerializer(origin_data).data, "nearby": nearby_spots})
     
 class ParkingNearbyPredictApi(APIView):
-    
-    class ParkingNearbyPredictInputSerializer(serializers.Serializer):
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    class ParkingNearbyPredictInputSerializer(NearbyOptionsSerializer):
         address = serializers.CharField()
         datetime = serializers.DateTimeField()
-        max_walk_time = serializers.IntegerField(required=False, default=5)
 
     @extend_schema(
         request=ParkingNearbyPredictInputSerializer,
@@ -94,32 +297,82 @@ class ParkingNearbyPredictApi(APIView):
 
         try:
             origin_data = geocode_address(address)
+        except GeocodeUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except GeocodeError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         lat, lng = origin_data["latitude"], origin_data["longitude"]
 
-        model_path = os.path.join(os.path.dirname(__file__), 'prediction', 'parking_model.joblib')
-        predictor = ParkingPredictor()
-        predictor.load(model_path)
-
-        nearby_spots = []
-        for spot in parking_list(filters={"is_occupied": False}):
-            walk_time = calculate_walk_time(lat, lng, spot.latitude, spot.longitude)
-            if (
-                walk_time <= max_walk_time
-                and spot.zone_number is not None
-                and spot.kerbside_id is not None
-            ):
-                spot_data = ParkingSerializer(spot).data
-                spot_data["walk_time"] = walk_time
-                spot_data["distance_km"] = haversine(lat, lng, spot.latitude, spot.longitude) / 1000
-                prob = predictor.predict_proba(
-                    int(float(spot.zone_number)),
-                    int(float(spot.kerbside_id)),
-                    dt.isoformat() if hasattr(dt, 'isoformat') else str(dt)
-                )
-                spot_data["predicted_available_probability"] = prob[0][1]
-                nearby_spots.append(spot_data)
-
-        serializer = ParkingNearbySerializer({"origin": origin_data, "nearby": nearby_spots})
-        return Response(serializer.data)
+        nearby_spots = nearby_spot_data(
+            free_bay_index(), lat, lng, max_walk_time,
+            input_data.validated_data.get("limit"), input_data.validated_data.get("sort"),
+            restriction_slot(input_data.validated_data, dt),
+        )
+        add_predictions(nearby_spots, dt)
+
+        # Spots are already encoded; ParkingNearbySerializer only documents the shape.
+        return Response({"origin": OriginSerializer(origin_data).data, "nearby": nearby_spots})
+
+class NearbyOriginSerializer(NearbyOptionsSerializer):
+    address = serializers.CharField(required=False)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
+
+    def validate(self, attrs):
+        has_point = "latitude" in attrs and "longitude" in attrs
+        if not has_point and not attrs.get("address"):
+            raise serializers.ValidationError("Give an address or both latitude and longitude.")
+        return attrs
+
+class ParkingNearbyBatchApi(APIView):
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    class ParkingNearbyBatchInputSerializer(serializers.Serializer):
+        origins = NearbyOriginSerializer(many=True, allow_empty=False)
+
+        def validate_origins(self, value):
+            limit = getattr(settings, "PARKING_BATCH_MAX_ORIGINS", 200)
+            if len(value) > limit:
+                raise serializers.ValidationError(f"At most {limit} origins per request.")
+            return value
+
+    @extend_schema(
+        request=ParkingNearbyBatchInputSerializer,
+        responses=ParkingNearbyBatchSerializer,
+        description=(
+            "Nearby free bays for many origins (addresses or coordinates) in one request. "
+            "Results come back in input order; an origin that can't be geocoded gets an error "
+            "instead of failing the batch."
+        ),
+    )
+    def post(self, request):
+        input_data = self.ParkingNearbyBatchInputSerializer(data=request.data)
+        input_data.is_valid(raise_exception=True)
+        origins = input_data.validated_data["origins"]
+
+        def has_point(o):
+            return "latitude" in o and "longitude" in o
+
+        geocoded = geocode_many([o["address"] for o in origins if not has_point(o)])
+        results, queries, rows = [], [], []
+        for o in origins:
+            if has_point(o):
+                label = o.get("address") or f"{o['latitude']},{o['longitude']}"
+                origin = {"latitude": o["latitude"], "longitude": o["longitude"], "address": label, "formatted_address": label}
+            else:
+                origin = geocoded[o["address"]]
+            if isinstance(origin, GeocodeError):
+                results.append({"origin": None, "error": str(origin), "nearby": []})
+                continue
+            rows.append(len(results))
+            queries.append((
+                origin["latitude"], origin["longitude"], o["max_walk_time"],
+                o.get("limit"), o.get("sort"), restriction_slot(o),
+            ))
+            results.append({"origin": OriginSerializer(origin).data, "error": None, "nearby": []})
+
+        if queries:
+            for row, nearby in zip(rows, batch_nearby_spot_data(free_bay_index(), queries)):
+                results[row]["nearby"] = nearby
+        return Response({"results": results})
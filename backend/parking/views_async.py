@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .prediction.scores import get_score_table
+from .renderers import FastJSONRenderer
+from .serializers import OriginSerializer
+from .services.google_maps import GeocodeError, GeocodeUnavailable, ageocode_address
+from .snapshot import free_bay_index
+from .utils import fresh_db_connection
+from .views import ParkingNearbyApi, ParkingNearbyPredictApi, add_predictions, nearby_spot_data, restriction_slot
+
+# Async twins of ParkingNearbyApi / ParkingNearbyPredictApi for the ASGI server:
+# the geocode call is awaited while the free-bay grid (and score table) load in worker
+# threads, so a slow geocoder parks a coroutine instead of a whole worker.
+
+def _json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+def _body(request):
+    try:
+        return json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+
+async def _geocode(address):
+    try:
+        return await ageocode_address(address), None
+    except GeocodeUnavailable as e:
+        return None, _json({"error": str(e)}, status=503)
+    except GeocodeError as e:
+        return None, _json({"error": str(e)}, status=400)
+
+@csrf_exempt
+@require_POST
+async def parking_nearby_async(request):
+    input_data = ParkingNearbyApi.ParkingNearbyInputSerializer(data=_body(request))
+    if not input_data.is_valid():
+        return _json(input_data.errors, status=400)
+    address = input_data.validated_data["address"]
+    max_walk_time = input_data.validated_data["max_walk_time"]
+
+    (origin_data, error), grid = await asyncio.gather(
+        _geocode(address),
+        sync_to_async(fresh_db_connection(free_bay_index), thread_sensitive=False)(),
+    )
+    if error is not None:
+        return error
+
+    nearby_spots = nearby_spot_data(
+        grid, origin_data["latitude"], origin_data["longitude"], max_walk_time,
+        input_data.validated_data.get("limit"), input_data.validated_data.get("sort"),
+        restriction_slot(input_data.validated_data),
+    )
+    return _json({"origin": OriginSerializer(origin_data).data, "nearby": nearby_spots})
+
+@csrf_exempt
+@require_POST
+async def parking_nearby_predict_async(request):
+    input_data = ParkingNearbyPredictApi.ParkingNearbyPredictInputSerializer(data=_body(request))
+    if not input_data.is_valid():
+        return _json(input_data.errors, status=400)
+    address = input_data.validated_data["address"]
+    dt = input_data.validated_data["datetime"]
+    max_walk_time = input_data.validated_data["max_walk_time"]
+
+    (origin_data, error), grid, _ = await asyncio.gather(
+        _geocode(address),
+        sync_to_async(fresh_db_connection(free_bay_index), thread_sensitive=False)(),
+        sync_to_async(get_score_table().get, thread_sensitive=False)(),
+    )
+    if error is not None:
+        return error
+
+    nearby_spots = nearby_spot_data(
+        grid, origin_data["latitude"], origin_data["longitude"], max_walk_time,
+        input_data.validated_data.get("limit"), input_data.validated_data.get("sort"),
+        restriction_slot(input_data.validated_data, dt),
+    )
+    # Usually a table lookup; bays missing from it may need the model loaded, so off-loop.
+    await sync_to_async(fresh_db_connection(add_predictions), thread_sensitive=False)(nearby_spots, dt)
+    return _json({"origin": OriginSerializer(origin_data).data, "nearby": nearby_spots})
@@ -1,20 +1,17 @@
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Tuple, Optional
 
-from django.db import connection
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 
-# Your DB schema prefix
-SCHEMA = "parking_prod"
+from .history_sql import OCC_CASE, _bay_list_subselect, _iso, _run, _scoped_bays, _t
+from .snapshot import bays_within
+from . import heatmaps, history_cache, rollups
 
-def _t(name: str) -> str:
-    return f"{SCHEMA}.{name}" if SCHEMA else name
-
-def _iso(dt: datetime) -> str:
-    return dt.strftime("%Y-%m-%d %H:%M:%S")
+SUMMARY_WINDOW_DAYS = 90
 
 def _parse_dt(val: Optional[str], default: datetime) -> str:
     if not val:
@@ -24,27 +21,7 @@ def _parse_dt(val: Optional[str], default: datetime) -> str:
     except Exception:
         return _iso(default)
 
-def _run(sql: str, params: List[Any]) -> List[Tuple]:
-    with connection.cursor() as cur:
-        cur.execute(sql, params)
-        return cur.fetchall()
-
-# -------------------- BAY SCOPE HELPERS --------------------
-
-def _scoped_bays(scope: str) -> Optional[str]:
-    """
-    Build a SQL subselect that yields a single-column table (bay_id) for the requested scope.
-    Supported given your actual columns:
-      - "segment" or "street_segment"  -> asset_parking_bay.segment_id = %s
-      - "bay"                           -> a single bay_id = %s
-    """
-    s = (scope or "").lower()
-    if s in ("segment", "street_segment"):
-        return f"(SELECT b.bay_id FROM {_t('asset_parking_bay')} b WHERE b.segment_id = %s)"
-    if s == "bay":
-        # Pass the bay_id directly as a single-row "table"
-        return "(SELECT %s AS bay_id)"
-    return None
+# -------------------- SQL builders --------------------
 
 def _hourly_sql_for_scope(sb_sql: str) -> str:
     return f"""
@@ -52,11 +29,7 @@ def _hourly_sql_for_scope(sb_sql: str) -> str:
     joined AS (
         SELECT
             o.status_ts AS tstamp,
-            CASE
-              WHEN UPPER(COALESCE(o.status_desc,'')) IN ('OCCUPIED','BUSY') THEN 1
-              WHEN o.status_desc IN (1,'1','Y','YES','Y') THEN 1
-              ELSE 0
-            END AS occ
+            {OCC_CASE} AS occ
         FROM {_t('ops_bay_status')} o
         JOIN scoped_bays sb ON sb.bay_id = o.bay_id
         WHERE o.status_ts BETWEEN %s AND %s
@@ -97,17 +70,68 @@ def _heatmap_sql_for_scope(sb_sql: str) -> str:
     SELECT dow, hh, samples, avg_free_ratio FROM bucketed ORDER BY dow, hh;
     """
 
+def _hourly_split(start_iso: str, end_iso: str) -> Optional[str]:
+    """
+    Hour boundary before which the window is read from agg_bay_hourly (see `manage.py
+    refresh_hourly_rollup`); raw rows only cover the tail from there to `end_iso`.
+    With PARKING_HISTORY_SOURCE "auto" that is the watermark's hour, with "rollup" the
+    whole window; None means raw rows only.
+    """
+    mode = getattr(settings, "PARKING_HISTORY_SOURCE", "auto")
+    window_stop = _iso(datetime.fromisoformat(end_iso).replace(minute=0, second=0) + timedelta(hours=1))
+    if mode == "rollup":
+        return window_stop
+    if mode != "auto":
+        return None
+    until = rollups.rollup_until()
+    if until is None or _iso(until) <= start_iso[:13] + ":00:00":
+        return None
+    return min(_iso(until), window_stop)
+
+def _resolve_bays(data: Dict[str, Any]) -> Tuple[Optional[str], List[Any], Optional[Response]]:
+    """
+    (scoped_bays subselect, its params, error response) for scope+id, or for lat+lng
+    resolved to bay ids through the in-app bay location index (no DB spatial routines).
+    """
+    has_scope = bool((data.get("scope") or "") and data.get("id"))
+    has_point = (data.get("lat") is not None and data.get("lng") is not None)
+
+    if not (has_scope or has_point):
+        return None, [], Response({"error": "Provide either scope+id OR lat+lng."}, status=400)
+
+    if has_scope:
+        sb = _scoped_bays(data["scope"])
+        if not sb:
+            return None, [], Response({"error": f"Unsupported scope '{data['scope']}'. Use 'segment' or 'bay'."}, status=400)
+        return sb, [data["id"]], None
+
+    radius = data.get("radiusMeters", 300)
+    if radius <= 0:
+        return None, [], Response({"error": "radiusMeters must be positive."}, status=400)
+    bay_ids = bays_within(data["lat"], data["lng"], radius)
+    max_bays = getattr(settings, "PARKING_HISTORY_MAX_RADIUS_BAYS", 500)
+    if len(bay_ids) > max_bays:
+        return None, [], Response({
+            "error": f"{len(bay_ids)} bays fall within {radius} m (limit {max_bays}). Use a smaller radiusMeters."
+        }, status=400)
+    return _bay_list_subselect(len(bay_ids)), bay_ids, None
+
+def _query_params(request, keys: List[str]) -> Dict[str, Any]:
+    # GET mirrors the POST body; absent keys are left out so serializer defaults apply.
+    return {k: v for k in keys if (v := request.GET.get(k)) not in (None, "")}
+
 # -------------------- Swagger request bodies --------------------
 
 class HistoryQueryBody(serializers.Serializer):
     # Use one of these:
     #   - scope+id (recommended: "segment" or "bay")
-    #   - lat+lng (+radius)  -> disabled w/o spatial permissions (explained at runtime)
+    #   - lat+lng (+radius)  -> bays resolved in-app from the bay list coordinates
     scope = serializers.ChoiceField(["segment", "street_segment", "bay"], required=False)
     id = serializers.CharField(required=False)
     lat = serializers.FloatField(required=False)
     lng = serializers.FloatField(required=False)
-    radiusMeters = serializers.IntegerField(required=False, default=300)
+    # At most ~a 60-minute walk, like the nearby endpoints.
+    radiusMeters = serializers.IntegerField(required=False, default=300, min_value=1, max_value=5000)
     startDate = serializers.CharField(required=False)
     endDate   = serializers.CharField(required=False)
 
@@ -119,7 +143,7 @@ class SummaryQueryBody(HistoryQueryBody):
 
 def _resolve_times_from_request(request) -> Tuple[str, str]:
     end_iso = _parse_dt(request.data.get("endDate") if request.method == "POST" else request.GET.get("endDate"),
-                        datetime.utcnow())
+                        datetime.fromisoformat(history_cache.open_window_end()))
     end_dt = datetime.fromisoformat(end_iso)
     start_iso = _parse_dt(
         request.data.get("startDate") if request.method == "POST" else request.GET.get("startDate"),
@@ -130,7 +154,7 @@ def _resolve_times_from_request(request) -> Tuple[str, str]:
 # -------------------- Views --------------------
 
 @extend_schema(
-    summary="Historical parking (hourly) — by segment or bay",
+    summary="Historical parking (hourly) — by segment, bay or point radius",
     request=HistoryQueryBody,
     responses={200: OpenApiResponse(description="Hourly series")},
     parameters=[
@@ -138,7 +162,7 @@ def _resolve_times_from_request(request) -> Tuple[str, str]:
         OpenApiParameter("id", str, False, description="segment_id or bay_id matching the chosen scope"),
         OpenApiParameter("startDate", str, False),
         OpenApiParameter("endDate", str, False),
-        # The lat/lng options are shown but will return a clear 400 due to DB permissions:
+        # lat/lng(+radiusMeters) resolve to the bays within the radius in-app:
         OpenApiParameter("lat", float, False),
         OpenApiParameter("lng", float, False),
         OpenApiParameter("radiusMeters", int, False),
@@ -151,35 +175,26 @@ class ParkingHistoryApi(APIView):
         data = body.validated_data
 
         start_iso, end_iso = _resolve_times_from_request(request)
+        key = history_cache.cache_key("hourly", data, start_iso, end_iso)
+        return history_cache.respond(key, end_iso, lambda: self._answer(data, start_iso, end_iso))
 
-        has_scope = bool((data.get("scope") or "") and data.get("id"))
-        has_point = (data.get("lat") is not None and data.get("lng") is not None)
-
-        if not (has_scope or has_point):
-            return Response({"error": "Provide either scope+id OR lat+lng."}, status=400)
-
-        # Point search disabled: no spatial perms + no lat/lon columns in asset_parking_bay
-        if has_point and not has_scope:
-            return Response({
-                "error": "Point-radius search is disabled for this database user (no EXECUTE on spatial routines), "
-                         "and asset_parking_bay does not expose lat/lon columns. Use scope+id instead.",
-                "how_to_test_quickly": {
-                    "scope": "segment",
-                    "id": "<an existing segment_id from asset_parking_bay>",
-                    "date_window_hint": "Use dates between your ops_bay_status min/max timestamps."
-                }
-            }, status=400)
-
-        # Scope path (works with your schema)
-        sb = _scoped_bays(data["scope"])
-        if not sb:
-            return Response({"error": f"Unsupported scope '{data['scope']}'. Use 'segment' or 'bay'."}, status=400)
+    def _answer(self, data: Dict[str, Any], start_iso: str, end_iso: str) -> Response:
+        sb, sb_params, error = _resolve_bays(data)
+        if error is not None:
+            return error
 
+        split = _hourly_split(start_iso, end_iso)
+        tail = split is None or split <= end_iso
+        source = "raw" if split is None else ("rollup+raw" if tail else "rollup")
         try:
-            sql = _hourly_sql_for_scope(sb)
-            # 'segment' takes 1 param; 'bay' also takes 1. Both then take start,end.
-            params = [data["id"], start_iso, end_iso]
-            rows = _run(sql, params)
+            rows = []
+            # The bay subselect's params (segment/bay id, or the radius bay ids) come first, then the range.
+            if split is not None:
+                # Rollup rows are whole hours; include the bucket the window starts in.
+                rows += _run(rollups.hourly_rollup_sql_for_scope(sb), [*sb_params, start_iso[:13] + ":00:00", split])
+            if tail:
+                # Hours at or after `split` aren't (fully) folded yet, so only they come from raw rows.
+                rows += _run(_hourly_sql_for_scope(sb), [*sb_params, max(start_iso, split or start_iso), end_iso])
         except Exception as e:
             return Response({"error": f"SQL error: {e}"}, status=400)
 
@@ -199,29 +214,22 @@ class ParkingHistoryApi(APIView):
                 "items": [],
                 "summary": {"count": 0},
                 "hint": "No observations for the chosen scope in this date range. "
-                        "Try a busier segment_id or expand the date window."
+                        "Try a busier segment_id or expand the date window.",
+                "source": source,
             }, status=200)
 
         return Response({
             "items": items,
-            "summary": {"count": len(items), "start": items[0]["timestamp"], "end": items[-1]["timestamp"]}
+            "summary": {"count": len(items), "start": items[0]["timestamp"], "end": items[-1]["timestamp"]},
+            "source": source,
         })
 
     def get(self, request):
-        fake = {
-            "scope": request.GET.get("scope"),
-            "id": request.GET.get("id"),
-            "lat": request.GET.get("lat"),
-            "lng": request.GET.get("lng"),
-            "radiusMeters": request.GET.get("radiusMeters"),
-            "startDate": request.GET.get("startDate"),
-            "endDate": request.GET.get("endDate"),
-        }
-        request._full_data = fake
+        request._full_data = _query_params(request, ["scope", "id", "lat", "lng", "radiusMeters", "startDate", "endDate"])
         return self.post(request)
 
 @extend_schema(
-    summary="Historical summary (7×24 heatmap) + suggested arrival windows — by segment or bay",
+    summary="Historical summary (7×24 heatmap) + suggested arrival windows — by segment, bay or point radius",
     request=SummaryQueryBody,
     responses={200: OpenApiResponse(description="Heatmap + windows")},
 )
@@ -231,59 +239,58 @@ class ParkingHistorySummaryApi(APIView):
         body.is_valid(raise_exception=True)
         data = body.validated_data
 
-        end_iso = _parse_dt(data.get("endDate"), datetime.utcnow())
+        end_iso = _parse_dt(data.get("endDate"), datetime.fromisoformat(history_cache.open_window_end()))
         end_dt = datetime.fromisoformat(end_iso)
-        start_iso = _parse_dt(data.get("startDate"), end_dt - timedelta(days=90))
+        start_iso = _parse_dt(data.get("startDate"), end_dt - timedelta(days=SUMMARY_WINDOW_DAYS))
         min_samples = int(data.get("minSamplesPerBucket", 10))
         topn = max(1, min(10, int(data.get("topN", 3))))
 
-        has_scope = bool((data.get("scope") or "") and data.get("id"))
-        has_point = (data.get("lat") is not None and data.get("lng") is not None)
-
-        if not (has_scope or has_point):
-            return Response({"error": "Provide either scope+id OR lat+lng."}, status=400)
-
-        if has_point and not has_scope:
-            return Response({
-                "error": "Point-radius search is disabled for this database user (no EXECUTE on spatial routines), "
-                         "and asset_parking_bay does not expose lat/lon columns. Use scope+id instead."
-            }, status=400)
-
-        sb = _scoped_bays(data["scope"])
-        if not sb:
-            return Response({"error": f"Unsupported scope '{data['scope']}'. Use 'segment' or 'bay'."}, status=400)
-
-        try:
-            sql = _heatmap_sql_for_scope(sb)
-            rows = _run(sql, [data["id"], start_iso, end_iso])
-        except Exception as e:
-            return Response({"error": f"SQL error: {e}"}, status=400)
+        key = history_cache.cache_key("summary", data, start_iso, end_iso, min_samples=min_samples, topn=topn)
+        return history_cache.respond(
+            key, end_iso, lambda: self._answer(data, start_iso, end_iso, min_samples, topn)
+        )
+
+    def _answer(self, data: Dict[str, Any], start_iso: str, end_iso: str, min_samples: int, topn: int) -> Response:
+        sb, sb_params, error = _resolve_bays(data)
+        if error is not None:
+            return error
+
+        # Trailing default windows are served from the materialised store when it is fresh.
+        trailing = bool(data.get("scope") and data.get("id")) and not (data.get("startDate") or data.get("endDate"))
+        heatmap = None
+        if trailing:
+            max_age = timedelta(minutes=getattr(settings, "PARKING_HEATMAP_MAX_AGE_MINUTES", 120))
+            heatmap = heatmaps.load(data["scope"], data["id"], SUMMARY_WINDOW_DAYS, max_age)
+        source = "store" if heatmap is not None else "raw"
+
+        if heatmap is None:
+            try:
+                sql = _heatmap_sql_for_scope(sb)
+                rows = _run(sql, [*sb_params, start_iso, end_iso])
+            except Exception as e:
+                return Response({"error": f"SQL error: {e}"}, status=400)
+            heatmap = [{"dow": int(dow), "hh": int(hh), "samples": int(s or 0), "avg_free_ratio": float(r or 0)} for dow, hh, s, r in rows]
+            if trailing:
+                try:
+                    heatmaps.register(data["scope"], data["id"], SUMMARY_WINDOW_DAYS)
+                except Exception:
+                    # Store tables missing; the raw answer is still good.
+                    pass
 
-        heatmap = [{"dow": int(dow), "hh": int(hh), "samples": int(s or 0), "avg_free_ratio": float(r or 0)} for dow, hh, s, r in rows]
         windows = _best_windows(heatmap, min_samples=min_samples, topn=topn)
 
         if not heatmap:
             return Response({
                 "heatmap": [],
                 "windows": [],
-                "hint": "No observations for the chosen scope in this date range. Try another id or wider dates."
+                "hint": "No observations for the chosen scope in this date range. Try another id or wider dates.",
+                "source": source,
             }, status=200)
 
-        return Response({"heatmap": heatmap, "windows": windows})
+        return Response({"heatmap": heatmap, "windows": windows, "source": source})
 
     def get(self, request):
-        fake = {
-            "scope": request.GET.get("scope"),
-            "id": request.GET.get("id"),
-            "lat": request.GET.get("lat"),
-            "lng": request.GET.get("lng"),
-            "radiusMeters": request.GET.get("radiusMeters"),
-            "startDate": request.GET.get("startDate"),
-            "endDate": request.GET.get("endDate"),
-            "minSamplesPerBucket": request.GET.get("minSamplesPerBucket"),
-            "topN": request.GET.get("topN"),
-        }
-        request._full_data = fake
+        request._full_data = _query_params(request, ["scope", "id", "lat", "lng", "radiusMeters", "startDate", "endDate", "minSamplesPerBucket", "topN"])
         return self.post(request)
 
 # -------------------- Helpers --------------------
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+
+from .live import Subscriber, broker, detector
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def _parse_bbox(raw):
+    parts = [float(x) for x in raw.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox needs minLat,minLng,maxLat,maxLng")
+    min_lat, min_lng, max_lat, max_lng = parts
+    return (min(min_lat, max_lat), min(min_lng, max_lng), max(min_lat, max_lat), max(min_lng, max_lng))
+
+async def parking_live_stream(request):
+    """
+    Server-Sent Events stream of live occupancy changes. Serve through ASGI.
+    Query: zone_number=7303,7304 and/or bbox=minLat,minLng,maxLat,maxLng.
+    Events: "status" (bay changed state), "removed" (bay left the view), and
+    "resync" when the client fell too far behind and should reload via /parking/changes.
+    """
+    zones = [z for z in request.GET.get("zone_number", "").split(",") if z] or None
+    bbox = None
+    if request.GET.get("bbox"):
+        try:
+            bbox = _parse_bbox(request.GET["bbox"])
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+    subscriber = Subscriber(zones=zones, bbox=bbox, max_queue=getattr(settings, "PARKING_LIVE_QUEUE_SIZE", 1000))
+    heartbeat = getattr(settings, "PARKING_LIVE_HEARTBEAT_SECONDS", 15)
+
+    async def events():
+        broker.subscribe(subscriber)
+        detector.ensure_running()
+        try:
+            yield _sse("ready", {"zones": sorted(subscriber.zones or []), "bbox": bbox})
+            while True:
+                if subscriber.overflowed:
+                    yield _sse("resync", {"reason": "slow consumer"})
+                    return
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event["type"], event)
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response